@@ -2,26 +2,82 @@
 import os
 import re
 import sys
+import json
+import shutil
 import sqlite3
+import tempfile
+import weakref
+import threading
 from base64 import b64encode
-# from urllib.parse import quote
-from typing import List, Dict, Any, Iterable, Optional
-
-ITEM_COUNTER = 0
-rx_query = re.compile(r'SELECT([\s\S]*)FROM[\s]+([A-Z_]+)(?:[\s]+INNER JOIN\s+([A-Z_]+))?')
-rx_cols = re.compile(r'[\s,;](Z[A-Z_]+)')
-rx_tags = re.compile(r'\%\{[A-Za-z_]+?\}')
+from hashlib import sha1
+from contextlib import contextmanager
+from urllib.parse import quote
+from io import StringIO
+from itertools import chain
+from typing import (
+    List, Any, Dict, Iterable, Iterator, Optional, TextIO, Tuple)
+try:
+    from .stats import Stats, measure
+except ImportError:  # fallback if not run as module
+    from stats import Stats, measure  # type: ignore[import, no-redef]
+
+rx_query = re.compile(r'SELECT([\s\S]*?)FROM[\s]+([A-Z_]+)(?:[\s]+INNER JOIN\s+([A-Z_]+))?')
+rx_cols = re.compile(r'[\s,;(](Z[A-Z_]+)')
+rx_tags = re.compile(r'%\{([A-Za-z_]+)((?::[^:}]*)*)\}')  # %{field:spec}
 
 
 # ===============================
 #   Helper methods
 # ===============================
 
-def incrItem(value: str, label: str) -> str:
-    global ITEM_COUNTER
-    ITEM_COUNTER += 1
-    return 'item{0}.{1}\r\nitem{0}.X-ABLabel:{2}'.format(
-        ITEM_COUNTER, value, label)
+class RenderContext:
+    ''' Per-card state. Each `makeVCard` call uses its own instance. '''
+    __slots__ = ('itemCounter',)
+
+    def __init__(self) -> None:
+        self.itemCounter = 0
+
+    def incrItem(self, value: str, label: str) -> str:
+        self.itemCounter += 1
+        return 'item{0}.{1}\r\nitem{0}.X-ABLabel:{2}'.format(
+            self.itemCounter, value, label)
+
+
+def iterBase64(chunks: Iterable[bytes]) -> Iterator[str]:
+    ''' Base64 encode chunks of arbitrary size. Output is one valid string. '''
+    rest = b''
+    for chunk in chunks:
+        if rest:
+            chunk = rest + chunk
+        cut = len(chunk) - len(chunk) % 3  # no padding until the very end
+        rest = chunk[cut:]
+        if cut:
+            yield b64encode(chunk[:cut] if rest else chunk).decode('ascii')
+    if rest:
+        yield b64encode(rest).decode('ascii')
+
+
+def writeFolded(fp: TextIO, prefix: str, parts: Iterable[str]) -> None:
+    '''
+    Write `prefix` and all `parts` as one line, folded at 75 chars
+    (continuation lines start with a space).
+    '''
+    fp.write(prefix)
+    room = 75 - len(prefix)  # assuming prefix fits on first line
+    for text in parts:
+        if not text:
+            continue
+        if room == 0:
+            fp.write('\r\n ')
+            room = 74
+        fp.write(text[:room])
+        if len(text) <= room:
+            room -= len(text)
+            continue
+        rest = text[room:]
+        fp.write('\r\n ')
+        fp.write('\r\n '.join(rest[i:i + 74] for i in range(0, len(rest), 74)))
+        room = 74 - (len(rest) % 74 or 74)
 
 
 def x520(val: str) -> Optional[str]:
@@ -30,40 +86,125 @@ def x520(val: str) -> Optional[str]:
     return val.replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
 
 
+def unx520(val: Optional[str]) -> Optional[str]:
+    ''' Inverse of `x520()`. Empty values are `None`. '''
+    if not val:
+        return None
+    return val.replace('\\n', '\n').replace('\\,', ',').replace('\\;', ';')
+
+
+LABEL_TYPES = {
+    '_$!<Home>!$_': ';type=HOME',
+    '_$!<Work>!$_': ';type=WORK',
+}
+
+
 def buildLabel(
+    ctx: RenderContext,
     prefix: str,
     label: str,
     isFirst: bool,
     suffix: str,
     validOther: bool = False,
 ) -> str:
-    typ = ''
-    if label == '_$!<Home>!$_':
-        typ = ';type=HOME'
-    elif label == '_$!<Work>!$_':
-        typ = ';type=WORK'
-    elif validOther and label == '_$!<Other>!$_':
+    typ = LABEL_TYPES.get(label, '')
+    if not typ and validOther and label == '_$!<Other>!$_':
         typ = ';type=OTHER'
 
     value = prefix + typ + (';type=pref:' if isFirst else ':') + suffix
     if typ:
         return value
     else:
-        return incrItem(value, label)
+        return ctx.incrItem(value, label)
+
+
+class SchemaCache:
+    '''
+    Column names per table, keyed by a hash of the database schema.
+    Introspection (`PRAGMA table_info`) runs once per schema and table,
+    sanitized queries are resolved once per schema.
+    Can be persisted across runs with `load()` and `save()`.
+    '''
+    VERSION = 1
+
+    def __init__(self) -> None:
+        self.schemas = {}  # type: Dict[str, Dict[str, List[str]]]
+        self.changed = False
+        # (schema, query) -> (sanitized query, [(missing column, table)])
+        self._queries = {}  # type: Dict[Tuple[str, str], Tuple[str, Any]]
+
+    @staticmethod
+    def schemaKey(cursor: sqlite3.Cursor) -> str:
+        ''' Hash of all table definitions. Cached on connection. '''
+        db = cursor.connection
+        key = getattr(db, 'schemaKey', None)  # type: Optional[str]
+        if not key:
+            sql = cursor.execute('''
+                SELECT group_concat(sql, ';') FROM (SELECT sql
+                FROM sqlite_master WHERE type = 'table' ORDER BY name);
+            ''').fetchone()[0] or ''
+            key = sha1(sql.encode('utf-8')).hexdigest()
+            try:
+                db.schemaKey = key  # type: ignore[attr-defined]
+            except AttributeError:  # not created with `connect()`
+                pass
+        return key
+
+    def columns(self, cursor: sqlite3.Cursor, table: str) -> List[str]:
+        tables = self.schemas.setdefault(self.schemaKey(cursor), {})
+        if table not in tables:
+            tables[table] = [x[1] for x in cursor.execute(
+                f'PRAGMA table_info({table});')]
+            self.changed = True
+        return tables[table]
+
+    def sanitize(self, cursor: sqlite3.Cursor, query: str) -> str:
+        ''' Replace columns which do not exist in db with `NULL`. '''
+        key = (self.schemaKey(cursor), query)
+        if key not in self._queries:
+            cols, table, joined = rx_query.findall(query)[0]
+            all_cols = set(self.columns(cursor, table))
+            if joined:
+                all_cols.update(self.columns(cursor, joined))
+            missing_cols = sorted(set(rx_cols.findall(cols)) - all_cols)
+            for missing in missing_cols:
+                query = query.replace(missing, 'NULL')
+            self._queries[key] = (query, [(x, table) for x in missing_cols])
+
+        query, missing_cols = self._queries[key]
+        for missing, table in missing_cols:
+            print(f'[WARN] Column "{missing}" not found in {table}. Ignoring.',
+                  file=sys.stderr)
+        return query
+
+    def load(self, path: str) -> None:
+        ''' Merge persisted schemas. Ignores missing or invalid files. '''
+        try:
+            with open(path, 'r') as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == self.VERSION:
+            for key, tables in data.get('schemas', {}).items():
+                self.schemas.setdefault(key, {}).update(tables)
+
+    def save(self, path: str) -> None:
+        ''' Write schemas to file (atomic), if anything changed. '''
+        if not self.changed:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'  # unique, if run in parallel
+        with open(tmp, 'w') as fp:
+            json.dump({'version': self.VERSION, 'schemas': self.schemas}, fp)
+        os.replace(tmp, path)
+        self.changed = False
+
+
+SCHEMA_CACHE = SchemaCache()
 
 
 def sanitize(cursor: sqlite3.Cursor, query: str) -> str:
-    cols, table, joined = rx_query.findall(query)[0]
-    sel_cols = {x for x in rx_cols.findall(cols)}
-    all_cols = {x[1] for x in cursor.execute(f'PRAGMA table_info({table});')}
-    if joined:
-        all_cols |= {x[1] for x in cursor.execute(f'PRAGMA table_info({joined});')}
-    missing_cols = sel_cols.difference(all_cols)
-    for missing in missing_cols:
-        print(f'[WARN] Column "{missing}" not found in {table}. Ignoring.',
-              file=sys.stderr)
-        query = query.replace(missing, 'NULL')
-    return query
+    return SCHEMA_CACHE.sanitize(cursor, query)
 
 
 # ===============================
@@ -71,9 +212,29 @@ def sanitize(cursor: sqlite3.Cursor, query: str) -> str:
 # ===============================
 
 class Queryable:  # Protocol
-    @staticmethod
-    def queryAll(cursor: sqlite3.Cursor) -> Iterable['Queryable']:
-        raise NotImplementedError()
+    __slots__ = ('_parent',)
+
+    # SQL parts, see `sql()`
+    OWNER = 'ZOWNER'  # column which references the `Record`
+    COLUMNS = ''
+    TABLE = ''
+    WHERE = ''
+    ORDER = 'ZISPRIMARY DESC, ZORDERINGINDEX'  # order within same owner
+
+    @classmethod
+    def sql(cls, where: str = '', select: Optional[str] = None) -> str:
+        ''' Build query. Result is sorted by owner. '''
+        where = ' AND '.join(filter(None, (cls.WHERE, where)))
+        return 'SELECT {} FROM {}{} ORDER BY {}, {};'.format(
+            select or (cls.OWNER + ', ' + cls.COLUMNS), cls.TABLE,
+            ' WHERE ' + where if where else '', cls.OWNER, cls.ORDER)
+
+    @classmethod
+    def queryAll(
+        cls, cursor: sqlite3.Cursor, where: str = '', params: List[Any] = []
+    ) -> Iterable['Queryable']:
+        return (cls(x) for x in cursor.execute(
+            sanitize(cursor, cls.sql(where)), params))
 
     def __init__(self, row: List[Any]):
         self._parent = -1
@@ -89,17 +250,14 @@ class Queryable:  # Protocol
     def asPrintable(self) -> str:
         return '?'
 
-    def asVCard(self, markPref: bool) -> str:
+    def asVCard(self, ctx: RenderContext, markPref: bool) -> str:
         raise NotImplementedError()
 
 
 class Email(Queryable):
-    @staticmethod
-    def queryAll(cursor: sqlite3.Cursor) -> Iterable['Email']:
-        return (Email(x) for x in cursor.execute(sanitize(cursor, '''
-            SELECT ZOWNER, ZLABEL, ZADDRESS
-            FROM ZABCDEMAILADDRESS
-            ORDER BY ZOWNER, ZISPRIMARY DESC, ZORDERINGINDEX;''')))
+    __slots__ = ('label', 'email')
+    COLUMNS = 'ZLABEL, ZADDRESS'
+    TABLE = 'ZABCDEMAILADDRESS'
 
     def __init__(self, row: List[Any]):
         self._parent = row[0]  # type: int
@@ -109,18 +267,27 @@ class Email(Queryable):
     def asPrintable(self) -> str:
         return self.email
 
-    def asVCard(self, markPref: bool) -> str:
+    def asVCard(self, ctx: RenderContext, markPref: bool) -> str:
         return buildLabel(
-            'EMAIL;type=INTERNET', self.label, markPref, self.email)
+            ctx, 'EMAIL;type=INTERNET', self.label, markPref, self.email)
 
 
 class Phone(Queryable):
-    @staticmethod
-    def queryAll(cursor: sqlite3.Cursor) -> Iterable['Phone']:
-        return (Phone(x) for x in cursor.execute(sanitize(cursor, '''
-            SELECT ZOWNER, ZLABEL, ZFULLNUMBER
-            FROM ZABCDPHONENUMBER
-            ORDER BY ZOWNER, ZISPRIMARY DESC, ZORDERINGINDEX;''')))
+    __slots__ = ('label', 'number')
+    COLUMNS = 'ZLABEL, ZFULLNUMBER'
+    TABLE = 'ZABCDPHONENUMBER'
+    LABEL_TYPES = {
+        '_$!<Mobile>!$_': ';type=CELL;type=VOICE',
+        'iPhone': ';type=IPHONE;type=CELL;type=VOICE',
+        '_$!<Home>!$_': ';type=HOME;type=VOICE',
+        '_$!<Work>!$_': ';type=WORK;type=VOICE',
+        '_$!<Main>!$_': ';type=MAIN',
+        '_$!<HomeFAX>!$_': ';type=HOME;type=FAX',
+        '_$!<WorkFAX>!$_': ';type=WORK;type=FAX',
+        '_$!<OtherFAX>!$_': ';type=OTHER;type=FAX',
+        '_$!<Pager>!$_': ';type=PAGER',
+        '_$!<Other>!$_': ';type=OTHER;type=VOICE'
+    }
 
     def __init__(self, row: List[Any]):
         self._parent = row[0]  # type: int
@@ -130,34 +297,19 @@ class Phone(Queryable):
     def asPrintable(self) -> str:
         return self.number
 
-    def asVCard(self, markPref: bool) -> str:
-        mapping = {
-            '_$!<Mobile>!$_': ';type=CELL;type=VOICE',
-            'iPhone': ';type=IPHONE;type=CELL;type=VOICE',
-            '_$!<Home>!$_': ';type=HOME;type=VOICE',
-            '_$!<Work>!$_': ';type=WORK;type=VOICE',
-            '_$!<Main>!$_': ';type=MAIN',
-            '_$!<HomeFAX>!$_': ';type=HOME;type=FAX',
-            '_$!<WorkFAX>!$_': ';type=WORK;type=FAX',
-            '_$!<OtherFAX>!$_': ';type=OTHER;type=FAX',
-            '_$!<Pager>!$_': ';type=PAGER',
-            '_$!<Other>!$_': ';type=OTHER;type=VOICE'
-        }
+    def asVCard(self, ctx: RenderContext, markPref: bool) -> str:
         value = (';type=pref:' if markPref else ':') + self.number
-        if self.label in mapping.keys():
-            return 'TEL' + mapping[self.label] + value
+        typ = self.LABEL_TYPES.get(self.label)
+        if typ:
+            return 'TEL' + typ + value
         else:
-            return incrItem('TEL' + value, self.label)
+            return ctx.incrItem('TEL' + value, self.label)
 
 
 class Address(Queryable):
-    @staticmethod
-    def queryAll(cursor: sqlite3.Cursor) -> Iterable['Address']:
-        return (Address(x) for x in cursor.execute(sanitize(cursor, '''
-            SELECT ZOWNER, ZLABEL,
-                ZSTREET, ZCITY, ZSTATE, ZZIPCODE, ZCOUNTRYNAME
-            FROM ZABCDPOSTALADDRESS
-            ORDER BY ZOWNER, ZISPRIMARY DESC, ZORDERINGINDEX;''')))
+    __slots__ = ('label', 'street', 'city', 'state', 'zip', 'country')
+    COLUMNS = 'ZLABEL, ZSTREET, ZCITY, ZSTATE, ZZIPCODE, ZCOUNTRYNAME'
+    TABLE = 'ZABCDPOSTALADDRESS'
 
     def __init__(self, row: List[Any]):
         self._parent = row[0]  # type: int
@@ -172,19 +324,18 @@ class Address(Queryable):
         return ', '.join(filter(None, (
             self.street, self.city, self.state, self.zip, self.country)))
 
-    def asVCard(self, markPref: bool) -> str:
+    def asVCard(self, ctx: RenderContext, markPref: bool) -> str:
         value = ';'.join((
             self.street, self.city, self.state, self.zip, self.country))
         return buildLabel(
-            'ADR', self.label, markPref, ';;' + value, validOther=True)
+            ctx, 'ADR', self.label, markPref, ';;' + value, validOther=True)
 
 
 class SocialProfile(Queryable):
-    @staticmethod
-    def queryAll(cursor: sqlite3.Cursor) -> Iterable['SocialProfile']:
-        return (SocialProfile(x) for x in cursor.execute(sanitize(cursor, '''
-            SELECT ZOWNER, ZSERVICENAME, ZUSERNAME
-            FROM ZABCDSOCIALPROFILE;''')))
+    __slots__ = ('service', 'user')
+    COLUMNS = 'ZSERVICENAME, ZUSERNAME'
+    TABLE = 'ZABCDSOCIALPROFILE'
+    ORDER = 'Z_PK'
 
     def __init__(self, row: List[Any]):
         self._parent = row[0]  # type: int
@@ -195,18 +346,18 @@ class SocialProfile(Queryable):
     def asPrintable(self) -> str:
         return self.service + ':' + self.user
 
-    def asVCard(self, markPref: bool) -> str:
+    def asVCard(self, ctx: RenderContext, markPref: bool) -> str:
         # Apple does some x-user, x-apple, and url stuff that is wrong
         return 'X-SOCIALPROFILE;type=' + self.service.lower() + ':' + self.user
 
 
 class Note(Queryable):
-    @staticmethod
-    def queryAll(cursor: sqlite3.Cursor) -> Iterable['Note']:
-        return (Note(x) for x in cursor.execute(sanitize(cursor, '''
-            SELECT ZCONTACT, ZTEXT
-            FROM ZABCDNOTE
-            WHERE ZTEXT IS NOT NULL;''')))
+    __slots__ = ('text',)
+    OWNER = 'ZCONTACT'
+    COLUMNS = 'ZTEXT'
+    TABLE = 'ZABCDNOTE'
+    WHERE = 'ZTEXT IS NOT NULL'
+    ORDER = 'Z_PK'
 
     def __init__(self, row: List[Any]):
         self._parent = row[0]  # type: int
@@ -215,17 +366,14 @@ class Note(Queryable):
     def asPrintable(self) -> str:
         return self.text
 
-    def asVCard(self, markPref: bool) -> str:
+    def asVCard(self, ctx: RenderContext, markPref: bool) -> str:
         return self.text
 
 
 class URL(Queryable):
-    @staticmethod
-    def queryAll(cursor: sqlite3.Cursor) -> Iterable['URL']:
-        return (URL(x) for x in cursor.execute(sanitize(cursor, '''
-            SELECT ZOWNER, ZLABEL, ZURL
-            FROM ZABCDURLADDRESS
-            ORDER BY ZOWNER, ZISPRIMARY DESC, ZORDERINGINDEX;''')))
+    __slots__ = ('label', 'url')
+    COLUMNS = 'ZLABEL, ZURL'
+    TABLE = 'ZABCDURLADDRESS'
 
     def __init__(self, row: List[Any]):
         self._parent = row[0]  # type: int
@@ -235,18 +383,27 @@ class URL(Queryable):
     def asPrintable(self) -> str:
         return self.url
 
-    def asVCard(self, markPref: bool) -> str:
-        return buildLabel('URL', self.label, markPref, self.url)
+    def asVCard(self, ctx: RenderContext, markPref: bool) -> str:
+        return buildLabel(ctx, 'URL', self.label, markPref, self.url)
 
 
 class Service(Queryable):
-    @staticmethod
-    def queryAll(cursor: sqlite3.Cursor) -> Iterable['Service']:
-        return (Service(x) for x in cursor.execute(sanitize(cursor, '''
-            SELECT ZOWNER, ZSERVICENAME, ZLABEL, ZADDRESS
-            FROM ZABCDMESSAGINGADDRESS
-            INNER JOIN ZABCDSERVICE ON ZSERVICE = ZABCDSERVICE.Z_PK
-            ORDER BY ZOWNER, ZISPRIMARY DESC, ZORDERINGINDEX;''')))
+    __slots__ = ('service', 'label', 'username')
+    COLUMNS = 'ZSERVICENAME, ZLABEL, ZADDRESS'
+    TABLE = ('ZABCDMESSAGINGADDRESS '
+             'INNER JOIN ZABCDSERVICE ON ZSERVICE = ZABCDSERVICE.Z_PK')
+    SPECIAL = ('Jabber', 'MSN', 'Yahoo', 'ICQ')  # with X-<SERVICE> field
+    SCHEMES = {
+        'Jabber': 'xmpp',
+        'GoogleTalk': 'xmpp',
+        'Facebook': 'xmpp',
+        'GaduGadu': 'x-apple',
+        'QQ': 'x-apple',
+        'ICQ': 'aim',
+        'MSN': 'msnim',
+        'Skype': 'skype',
+        'Yahoo': 'ymsgr',
+    }
 
     def __init__(self, row: List[Any]):
         self._parent = row[0]  # type: int
@@ -260,26 +417,15 @@ class Service(Queryable):
         return ', '.join((self.service, self.label, self.username))
 
     def isSpecial(self) -> bool:
-        return self.service in ['Jabber', 'MSN', 'Yahoo', 'ICQ']
-
-    def asSpecialStr(self, markPref: bool) -> str:
-        return buildLabel('X-' + self.service.upper(), self.label, markPref,
-                          self.username)
-
-    def asVCard(self, markPref: bool) -> str:
-        if self.service in ['Jabber', 'GoogleTalk', 'Facebook']:
-            typ = 'xmpp'
-        elif self.service in ['GaduGadu', 'QQ']:
-            typ = 'x-apple'
-        elif self.service == 'ICQ':
-            typ = 'aim'
-        elif self.service == 'MSN':
-            typ = 'msnim'
-        elif self.service == 'Skype':
-            typ = 'skype'
-        elif self.service == 'Yahoo':
-            typ = 'ymsgr'
-        else:
+        return self.service in self.SPECIAL
+
+    def asSpecialStr(self, ctx: RenderContext, markPref: bool) -> str:
+        return buildLabel(ctx, 'X-' + self.service.upper(), self.label,
+                          markPref, self.username)
+
+    def asVCard(self, ctx: RenderContext, markPref: bool) -> str:
+        typ = self.SCHEMES.get(self.service)
+        if not typ:
             typ = 'unknown'
             print(f'Unknown Service: "{self.service}"', file=sys.stderr)
 
@@ -287,8 +433,135 @@ class Service(Queryable):
         # Even worse, you break it so that reimport fails.
         # user= quote(self.username, safe='!/()=_:.\'$&').replace('%2C', '\\,')
         user = self.username
-        return buildLabel('IMPP;X-SERVICE-TYPE=' + self.service, self.label,
-                          markPref, typ + ':' + user)
+        return buildLabel(ctx, 'IMPP;X-SERVICE-TYPE=' + self.service,
+                          self.label, markPref, typ + ':' + user)
+
+
+# ===============================
+#   Image data
+# ===============================
+
+PRAGMAS = ('query_only = 1',)
+SCAN_PRAGMAS = ('cache_size = -8192',)  # 8 MB, one sequential pass
+_LOCAL = threading.local()  # per-thread connection cache for Image.read()
+_BLOB_LOCK = threading.RLock()  # reentrant, finalizer may run during gc
+_BLOB_OPEN = {}  # type: Dict[str, List[sqlite3.Connection]]  # by db_path
+
+
+class _Connection(sqlite3.Connection):
+    ''' Connection which can hold the `SchemaCache.schemaKey`. '''
+    schemaKey = None  # type: Optional[str]
+
+
+def connect(db_path: str, scan: bool = True) -> sqlite3.Connection:
+    '''
+    Open database read-only (URI `mode=ro`), does not block Contacts.app.
+    Falls back to a regular connection if the database cannot be opened
+    read-only (e.g., WAL mode but `-shm` file missing or not writable).
+    Connections with `scan=False` (image blobs) keep the default page cache
+    and can be closed from any thread (see `closeBlobConnections()`).
+    '''
+    uri = 'file:{}?mode=ro'.format(quote(os.path.abspath(db_path)))
+    try:
+        db = sqlite3.connect(uri, uri=True, isolation_level=None,
+                             check_same_thread=scan, factory=_Connection)
+        db.execute('PRAGMA schema_version').fetchone()  # fail early
+    except sqlite3.OperationalError as e:
+        print(f'[WARN] Cannot open "{db_path}" read-only ({e}).',
+              'Using regular connection. Consider --snapshot.',
+              file=sys.stderr)
+        db = sqlite3.connect(db_path, isolation_level=None,
+                             check_same_thread=scan, factory=_Connection)
+    for pragma in PRAGMAS + (SCAN_PRAGMAS if scan else ()):
+        db.execute('PRAGMA ' + pragma)
+    return db
+
+
+class _ThreadConnections:
+    ''' Blob connections of one thread, closed when the thread ends. '''
+
+    def __init__(self) -> None:
+        self.byPath = {}  # type: Dict[str, sqlite3.Connection]
+        weakref.finalize(self, _closeConnections, self.byPath)
+
+
+def _closeConnections(byPath: Dict[str, sqlite3.Connection]) -> None:
+    with _BLOB_LOCK:
+        for db_path, db in byPath.items():
+            others = _BLOB_OPEN.get(db_path, [])
+            if db in others:
+                others.remove(db)
+                if not others:
+                    del _BLOB_OPEN[db_path]
+            db.close()
+        byPath.clear()
+
+
+def _blobConnection(db_path: str) -> sqlite3.Connection:
+    cache = getattr(_LOCAL, 'connections', None)
+    if cache is None:
+        cache = _LOCAL.connections = _ThreadConnections()
+    with _BLOB_LOCK:
+        db = cache.byPath.get(db_path)
+        if db is None or db not in _BLOB_OPEN.get(db_path, ()):  # closed
+            db = cache.byPath[db_path] = connect(db_path, scan=False)
+            _BLOB_OPEN.setdefault(db_path, []).append(db)
+    return db
+
+
+def closeBlobConnections(db_path: str) -> None:
+    ''' Close connections of `Image.read()` in all threads. '''
+    with _BLOB_LOCK:
+        for db in _BLOB_OPEN.pop(db_path, []):
+            db.close()
+
+
+class Image:
+    ''' Lazy image handle. Image data is only read when needed. '''
+    __slots__ = ('header', 'size', 'path', 'dbPath', 'rowid')
+    HEADER_SIZE = 256  # enough for external references (null-terminated)
+    CHUNK_SIZE = 3 * 2 ** 16  # multiple of 3, needed for chunked base64
+
+    def __init__(self, header: bytes, size: int) -> None:
+        self.header = header  # first bytes of image data
+        self.size = size  # total bytes
+        self.path = None  # type: Optional[str]  # external file
+        self.dbPath = None  # type: Optional[str]  # embedded blob
+        self.rowid = -1  # ZABCDRECORD.Z_PK of embedded blob
+
+    def __repr__(self) -> str:
+        return '<Image {} bytes, {}>'.format(
+            self.size, self.path or f'{self.dbPath}#{self.rowid}')
+
+    def iterChunks(self, chunkSize: int = CHUNK_SIZE) -> Iterator[bytes]:
+        if self.path:
+            with open(self.path, 'rb') as fp:
+                yield from iter(lambda: fp.read(chunkSize), b'')
+        elif self.dbPath:
+            db = _blobConnection(self.dbPath)
+            if hasattr(db, 'blobopen'):  # Python 3.11+
+                with db.blobopen('ZABCDRECORD', 'ZTHUMBNAILIMAGEDATA',
+                                 self.rowid, readonly=True) as blob:
+                    blob.seek(1)  # skip storage type indicator
+                    yield from iter(lambda: blob.read(chunkSize), b'')
+            else:
+                for offset in range(2, self.size + 2, chunkSize):
+                    yield db.execute(
+                        'SELECT substr(ZTHUMBNAILIMAGEDATA, ?, ?) '
+                        'FROM ZABCDRECORD WHERE Z_PK = ?;',
+                        [offset, chunkSize, self.rowid]).fetchone()[0]
+
+    def read(self) -> bytes:
+        return b''.join(self.iterChunks())
+
+    def saveAs(self, path: str) -> None:
+        ''' Copy image to file (without loading it into memory). '''
+        if self.path:
+            shutil.copyfile(self.path, path)  # uses sendfile if possible
+        else:
+            with open(path, 'wb') as fp:
+                for chunk in self.iterChunks():
+                    fp.write(chunk)
 
 
 # ===============================
@@ -296,27 +569,53 @@ class Service(Queryable):
 # ===============================
 
 class Record:
+    __slots__ = (
+        'id', 'firstname', 'lastname', 'middlename', 'nameprefix',
+        'namesuffix', 'nickname', 'maidenname', 'phonetic_firstname',
+        'phonetic_middlename', 'phonetic_lastname', 'phonetic_org',
+        'organization', 'department', 'jobtitle', 'bday', 'email', 'phone',
+        'address', 'socialprofile', 'note', 'urls', 'service', 'image',
+        'iscompany', 'modified')
+    COLUMNS = '''Z_PK,
+        ZFIRSTNAME, ZLASTNAME, ZMIDDLENAME, ZTITLE, ZSUFFIX,
+        ZNICKNAME, ZMAIDENNAME,
+        ZPHONETICFIRSTNAME, ZPHONETICMIDDLENAME, ZPHONETICLASTNAME,
+        ZPHONETICORGANIZATION, ZORGANIZATION, ZDEPARTMENT, ZJOBTITLE,
+        strftime('%Y-%m-%d', ZBIRTHDAY + 978307200, 'unixepoch'),
+        ZDISPLAYFLAGS, ZMODIFICATIONDATE'''
+    IMAGE_COLUMNS = 'substr(ZTHUMBNAILIMAGEDATA, 1, {}), ' \
+        'length(ZTHUMBNAILIMAGEDATA)'.format(Image.HEADER_SIZE)
+
+    @staticmethod
+    def columns(images: bool = True) -> str:
+        ''' Column names for SELECT statement. Image data is not queried. '''
+        return Record.COLUMNS + ', ' + (
+            Record.IMAGE_COLUMNS if images else 'NULL, NULL')
+
     @staticmethod
-    def queryAll(cursor: sqlite3.Cursor) -> Dict[int, 'Record']:
-        # get z_ent id that is used for contact cards
-        z_ent = cursor.execute(
+    def contactEntity(cursor: sqlite3.Cursor) -> int:
+        ''' Get z_ent id that is used for contact cards '''
+        return cursor.execute(
             'SELECT Z_ENT FROM Z_PRIMARYKEY WHERE Z_NAME == "ABCDContact"'
         ).fetchone()[0]
-        # find all records that match this id
-        return {x[0]: Record(x) for x in cursor.execute(sanitize(cursor, '''
-            SELECT Z_PK,
-                ZFIRSTNAME, ZLASTNAME, ZMIDDLENAME, ZTITLE, ZSUFFIX,
-                ZNICKNAME, ZMAIDENNAME,
-                ZPHONETICFIRSTNAME, ZPHONETICMIDDLENAME, ZPHONETICLASTNAME,
-                ZPHONETICORGANIZATION, ZORGANIZATION, ZDEPARTMENT, ZJOBTITLE,
-                strftime('%Y-%m-%d', ZBIRTHDAY + 978307200, 'unixepoch'),
-                ZTHUMBNAILIMAGEDATA, ZDISPLAYFLAGS
+
+    @staticmethod
+    def queryAll(
+        cursor: sqlite3.Cursor, images: bool = True,
+        where: str = '', params: List[Any] = [],
+    ) -> Iterable['Record']:
+        z_ent = Record.contactEntity(cursor)
+        where = f' AND ({where})' if where else ''
+        # find all records that match this id (sorted, required for merge)
+        return (Record(x) for x in cursor.execute(sanitize(cursor, f'''
+            SELECT {Record.columns(images)}
             FROM ZABCDRECORD
-            WHERE Z_ENT = ?;'''), [z_ent])}
+            WHERE Z_ENT = ?{where}
+            ORDER BY Z_PK;'''), [z_ent] + params))
 
     @staticmethod
     def initEmpty(id: int) -> 'Record':
-        return Record([id] + [None] * 17)
+        return Record([id] + [None] * 19)
 
     def __init__(self, row: List[Any]) -> None:
         self.id = row[0]  # type: int
@@ -342,30 +641,58 @@ class Record:
         self.note = None  # type: Optional[str]
         self.urls = []  # type: List[URL]
         self.service = []  # type: List[Service]
-        self.image = row[16]  # type: Optional[bytes]
-        display_flags = row[17] or 0  # type: int
+        display_flags = row[16] or 0  # type: int
         self.iscompany = bool(display_flags & 1)  # type: bool
-        self.fullname = self.organization if self.iscompany else ' '.join(
-            filter(None, [self.nameprefix, self.firstname, self.middlename,
-                          self.lastname, self.namesuffix]))
+        self.modified = row[17]  # type: Optional[float]
+        self.image = None  # type: Optional[Image]
+        if row[18]:
+            self.image = Image(row[18], row[19])
 
     def __repr__(self) -> str:
         return self.makeVCard()
 
+    @property
+    def fullname(self) -> str:
+        if self.iscompany:
+            return self.organization
+        return ' '.join(filter(None, [
+            self.nameprefix, self.firstname, self.middlename, self.lastname,
+            self.namesuffix]))
+
+    def attach(self, attr: Queryable) -> None:
+        ''' Add data field to the corresponding attribute list. '''
+        if isinstance(attr, Email):
+            self.email.append(attr)
+        elif isinstance(attr, Phone):
+            self.phone.append(attr)
+        elif isinstance(attr, Address):
+            self.address.append(attr)
+        elif isinstance(attr, SocialProfile):
+            self.socialprofile.append(attr)
+        elif isinstance(attr, Note):
+            self.note = attr.text
+        elif isinstance(attr, URL):
+            self.urls.append(attr)
+        elif isinstance(attr, Service):
+            self.service.append(attr)
+        else:
+            raise NotImplementedError(f'Unknown attribute type: {attr!r}')
+
     def formatFilename(self, format: str) -> str:
-        matches = rx_tags.findall(format)
-        for tag in matches:
-            value = getattr(self, tag[2:-1])
-            if isinstance(value, list):
-                value = value[0] if len(value) else None
-            if isinstance(value, Queryable):
-                value = value.asPrintable()
-            format = format.replace(tag, str(value or '').replace('/', ':'))
-        return format
+        ''' See `FilenameTemplate`. Compiled templates are cached. '''
+        template = _TEMPLATES.get(format)
+        if not template:
+            template = _TEMPLATES[format] = FilenameTemplate(format)
+        return template.apply(self)
 
     def makeVCard(self) -> str:
-        global ITEM_COUNTER
-        ITEM_COUNTER = 0
+        buffer = StringIO()
+        self.writeVCard(buffer)
+        return buffer.getvalue()
+
+    def writeVCard(self, fp: TextIO) -> None:
+        ''' Write vcard to stream. Image data is written in chunks. '''
+        ctx = RenderContext()
 
         # rquired fields: BEGIN, END, VERSION, N, FN
         data = [
@@ -383,7 +710,7 @@ class Record:
         def optionalArray(arr: Iterable[Queryable]) -> None:
             isFirst = True
             for x in arr:
-                data.append(x.asVCard(markPref=isFirst))
+                data.append(x.asVCard(ctx, markPref=isFirst))
                 isFirst = False
 
         optional('NICKNAME', self.nickname)
@@ -408,116 +735,356 @@ class Record:
                 key += ';X-APPLE-OMIT-YEAR=1604'
             optional(key, self.bday)
 
-        for kind in ['Jabber', 'MSN', 'Yahoo', 'ICQ']:
+        for kind in Service.SPECIAL:
             isFirst = True
             for x in self.service:
                 if x.service == kind:
-                    data.append(x.asSpecialStr(markPref=isFirst))
+                    data.append(x.asSpecialStr(ctx, markPref=isFirst))
                     isFirst = False
         optionalArray(self.service)
 
+        chunks = iter(())  # type: Iterator[bytes]
         if self.image:
-            data.append(self.imageAsBase64())
+            # open image before writing, fail early if image is not readable
+            chunks = self.image.iterChunks()
+            firstChunk = next(chunks, b'')
+            chunks = chain([firstChunk], chunks)
+
+        fp.write('\r\n'.join(data) + '\r\n')
+        if self.image:
+            self.writePhoto(fp, chunks)
+            fp.write('\r\n')
         if self.iscompany:
-            data.append('X-ABShowAs:COMPANY')
-        data.append('END:VCARD')
-        return '\r\n'.join(data) + '\r\n'
+            fp.write('X-ABShowAs:COMPANY\r\n')
+        fp.write('END:VCARD\r\n')
 
     def imageAsBase64(self) -> str:
         if not self.image:
             return ''  # already checked before call, never happens
-        t = 'PHOTO;ENCODING=b;TYPE='
-        if self.image[6:10] == b'JFIF':
-            t += 'JPEG:' + b64encode(self.image).decode('ascii')
-        # place 'P' manually for nice 75 char alignment
-        return t[0] + '\r\n '.join(t[i:i + 74] for i in range(1, len(t), 74))
+        buffer = StringIO()
+        self.writePhoto(buffer, self.image.iterChunks())
+        return buffer.getvalue()
+
+    def writePhoto(self, fp: TextIO, chunks: Iterable[bytes]) -> None:
+        ''' Write folded PHOTO field (without trailing newline). '''
+        if self.image and self.image.header[6:10] == b'JFIF':
+            writeFolded(fp, 'PHOTO;ENCODING=b;TYPE=JPEG:',
+                        iterBase64(chunks))
+        else:
+            writeFolded(fp, 'PHOTO;ENCODING=b;TYPE=', ())
 
-    def imagePreprocess(self, basePath: str) -> None:
+    def imagePreprocess(self, basePath: str, dbPath: str) -> None:
+        ''' Resolve image location. Does not load the image into memory. '''
         # Assumption: Apple uses the first character to determine storage type
         #  \x01: embedded image
         #  \x02: external reference
-        if not self.image:
+        img = self.image
+        if not img:
             return  # no image exists, nothing to do
 
-        if self.image[0] == 1:  # loaded into memory
-            self.image = self.image[1:]  # remove storage type indicator
+        self.image = None  # until verified
+        if img.header[0] == 1:  # embedded in db
+            img.header = img.header[1:]  # remove storage type indicator
+            img.size -= 1
+            img.dbPath = dbPath
+            img.rowid = self.id
 
-        elif self.image[0] == 2:  # external referenced image
+        elif img.header[0] == 2:  # external referenced image
             # for whatever reason this is null-terminated
-            imgName = self.image[1:].rstrip(b'\x00').decode('ascii')
+            imgName = img.header[1:].rstrip(b'\x00').decode('ascii')
             imgPath = os.path.join(basePath, imgName)
             if os.path.isfile(imgPath):
                 with open(imgPath, 'rb') as fp:
-                    self.image = fp.read()
+                    img.header = fp.read(Image.HEADER_SIZE)
+                img.size = os.path.getsize(imgPath)
+                img.path = imgPath
             else:
-                self.image = None
                 raise FileNotFoundError(
                     f'Image reference not found: {imgPath}')
         else:
             raise NotImplementedError(
                 'Unexpected image data[{}]: {!r}'.format(
-                    len(self.image), self.image[:20] + b'...'))
+                    img.size, img.header[:20] + b'...'))
 
-        # by now loaded into memory either way
-        if self.image[6:10] != b'JFIF':
-            self.image = None
+        if img.header[6:10] != b'JFIF':
             # We could convert to JPEG but I don't like to introduce a
             # dependecy on Pillow solely for this use-case.
             # Should never trigger because Apple converts to JPEG anyway.
             raise NotImplementedError('Only JPEG images are supported.')
+        self.image = img
 
 
 # ===============================
 #   Main Entry
 # ===============================
 
-class ABCDDB:
-    @staticmethod
-    def load(db_path: str) -> List['Record']:
-        db = sqlite3.connect(db_path)
-        cur = db.cursor()
-
-        records = Record.queryAll(cur)
+class FilenameTemplate:
+    '''
+    Compiled filename format, e.g. `%{id}_%{fullname}.vcf`.
+    Each tag is a field of `Record`, optionally followed by format specs:
+    - `%{fullname:20}`: truncate to 20 characters
+    - `%{fullname:lower}` or `%{fullname:upper}`: change case
+    - `%{fullname:safe}`: replace characters not allowed on Windows & macOS
+    Specs are applied in order, e.g. `%{email:safe:lower:30}`.
+    `/` in field values is replaced with `slash` (no subdirectories).
+    Raises `ValueError` for unknown fields or specs.
+    '''
+    __slots__ = ('format', 'slash', '_parts')
+    UNSAFE = re.compile(r'[\x00-\x1f\\:*?"<>|]')
+    SPECS = {
+        'lower': str.lower,
+        'upper': str.upper,
+        'safe': lambda x: FilenameTemplate.UNSAFE.sub('_', x),
+    }
+
+    def __init__(self, format: str, slash: str = ':') -> None:
+        self.format = format
+        self.slash = slash
+        fields = set(Record.__slots__).union(
+            k for k, v in vars(Record).items() if isinstance(v, property))
+        # alternating: literal, (field, specs), literal, ..., literal
+        self._parts = []  # type: List[Any]
+        pos = 0
+        for match in rx_tags.finditer(format):
+            field, specs = match.groups()
+            if field not in fields:
+                raise ValueError(f'Unknown field "{field}" in "{format}".'
+                                 f' Use: {", ".join(sorted(fields))}')
+            self._parts.append(format[pos:match.start()])
+            self._parts.append((field, [self._spec(x)
+                                        for x in specs.split(':')[1:]]))
+            pos = match.end()
+        self._parts.append(format[pos:])
 
-        def _getOrMake(attr: Queryable) -> Record:
-            rec = records.get(attr.parent)
-            if not rec:
-                rec = Record.initEmpty(attr.parent)
-                records[attr.parent] = rec
-                print('[WARN] Found unreferenced data field:', attr,
-                      file=sys.stderr)
-            return rec
+    @staticmethod
+    def _spec(spec: str) -> Any:
+        if spec.isdigit():
+            length = int(spec)
+            return lambda x: x[:length]
+        if spec not in FilenameTemplate.SPECS:
+            raise ValueError(f'Unknown format spec "{spec}". Use: a number'
+                             f' or {", ".join(FilenameTemplate.SPECS)}')
+        return FilenameTemplate.SPECS[spec]
+
+    def apply(self, rec: 'Record') -> str:
+        result = self._parts[:]
+        for i in range(1, len(result), 2):
+            field, specs = result[i]
+            value = getattr(rec, field)
+            if isinstance(value, list):
+                value = value[0] if len(value) else None
+            if isinstance(value, Queryable):
+                value = value.asPrintable()
+            value = str(value or '').replace('/', self.slash)
+            for fn in specs:
+                value = fn(value)
+            result[i] = value
+        return ''.join(result)
+
+
+_TEMPLATES = {}  # type: Dict[str, FilenameTemplate]
+
+
+class RecordFilter:
+    '''
+    Export only a subset of contacts. All given conditions must match:
+    - `ids`: list of `Record.id` (`Z_PK`)
+    - `company`: `True` only companies, `False` no companies
+    - `modifiedSince`: unix timestamp
+    - `group`: name of a contact group
+    Conditions are part of the SQL queries. Data of other contacts
+    (including images) is never read.
+    '''
+    __slots__ = ('ids', 'company', 'modifiedSince', 'group')
+
+    def __init__(
+        self,
+        ids: Optional[List[int]] = None,
+        company: Optional[bool] = None,
+        modifiedSince: Optional[float] = None,
+        group: Optional[str] = None,
+    ) -> None:
+        self.ids = ids
+        self.company = company
+        self.modifiedSince = modifiedSince
+        self.group = group
+
+    def __bool__(self) -> bool:
+        return any(x is not None for x in (
+            self.ids, self.company, self.modifiedSince, self.group))
+
+    def where(self, cursor: sqlite3.Cursor) -> Tuple[str, List[Any]]:
+        ''' Condition on `ZABCDRECORD` columns and its parameters. '''
+        conds = []  # type: List[str]
+        params = []  # type: List[Any]
+        if self.ids is not None:
+            conds.append('Z_PK IN ({})'.format(', '.join('?' * len(self.ids))))
+            params.extend(self.ids)
+        if self.company is not None:
+            conds.append('{}(ifnull(ZDISPLAYFLAGS, 0) & 1)'.format(
+                '' if self.company else 'NOT '))
+        if self.modifiedSince is not None:
+            conds.append('ZMODIFICATIONDATE >= ?')
+            params.append(self.modifiedSince - 978307200)  # Core Data epoch
+        if self.group is not None:
+            table, member, group = RecordFilter.groupTable(cursor)
+            conds.append(f'''Z_PK IN (SELECT {member} FROM {table}
+                WHERE {group} IN (SELECT Z_PK FROM ZABCDRECORD
+                                  WHERE ZNAME = ?))''')
+            params.append(self.group)
+        if conds:  # only contacts, e.g., not groups with same condition
+            conds.insert(0, 'Z_ENT = ?')
+            params.insert(0, Record.contactEntity(cursor))
+        return ' AND '.join(conds), params
 
-        # query once, then distribute
-        for email in Email.queryAll(cur):
-            _getOrMake(email).email.append(email)
+    @staticmethod
+    def owner(column: str, where: str) -> str:
+        ''' Condition for attribute tables (`column` references record). '''
+        if not where:
+            return ''
+        return f'{column} IN (SELECT Z_PK FROM ZABCDRECORD WHERE {where})'
 
-        for phone in Phone.queryAll(cur):
-            _getOrMake(phone).phone.append(phone)
+    @staticmethod
+    def groupTable(cursor: sqlite3.Cursor) -> Tuple[str, str, str]:
+        '''
+        Find many-to-many table for group membership (name depends on
+        entity ids, e.g. `Z_22PARENTGROUPS`).
+        Returns `(table, member column, group column)`.
+        '''
+        for name, in cursor.execute('''
+                SELECT name FROM sqlite_master WHERE type = 'table'
+                AND name GLOB 'Z_[0-9]*PARENTGROUPS';''').fetchall():
+            cols = [x[1] for x in cursor.execute(
+                f'PRAGMA table_info({name});')]
+            member = [x for x in cols if x.endswith('CONTACTS')]
+            group = [x for x in cols if 'PARENTGROUPS' in x]
+            if member and group:
+                return name, member[0], group[0]
+        raise ValueError('Group membership table not found in database.')
+
+
+class _Peekable:
+    ''' Iterator wrapper with one element lookahead. '''
+    __slots__ = ('_iter', 'head')
+
+    def __init__(self, iterable: Iterable[Any]) -> None:
+        self._iter = iter(iterable)
+        self.head = next(self._iter, None)  # type: Any
+
+    def pop(self) -> Any:
+        value = self.head
+        self.head = next(self._iter, None)
+        return value
 
-        for address in Address.queryAll(cur):
-            _getOrMake(address).address.append(address)
 
-        for social in SocialProfile.queryAll(cur):
-            _getOrMake(social).socialprofile.append(social)
+ATTRIBUTE_TYPES = (Email, Phone, Address, SocialProfile, Note, URL, Service)
+LOADERS = ('merge', 'json')
 
-        for note in Note.queryAll(cur):
-            _getOrMake(note).note = note.text
 
-        for url in URL.queryAll(cur):
-            _getOrMake(url).urls.append(url)
+class ABCDDB:
+    @staticmethod
+    def load(
+        db_path: str, loader: str = 'merge', images: bool = True,
+        stats: Optional[Stats] = None,
+        recordFilter: Optional[RecordFilter] = None,
+    ) -> List['Record']:
+        return list(ABCDDB.iterRecords(
+            db_path, loader, images, stats, recordFilter=recordFilter))
 
-        for service in Service.queryAll(cur):
-            _getOrMake(service).service.append(service)
+    @staticmethod
+    def iterRecords(
+        db_path: str, loader: str = 'merge', images: bool = True,
+        stats: Optional[Stats] = None, snapshot: Optional[str] = None,
+        recordFilter: Optional[RecordFilter] = None,
+        connection: Optional[sqlite3.Connection] = None,
+    ) -> Iterator['Record']:
+        '''
+        Yield fully assembled records one at a time.
+        Images are loaded lazily (see `Image`). If `images` is `False`,
+        the image column is not queried at all.
+        `loader` selects the query strategy:
+        - `merge`: one query per table (sorted by owner) and an ordered
+            merge-join over all cursors.
+        - `json`: one query with a correlated `json_group_array` subquery per
+            attribute table. SQLite does the grouping, one row per contact.
+            Data fields without corresponding contact are yielded last.
+        If `stats` is set, query time & row count (phase `query <Table>`)
+        and image preprocessing time (phase `image`) are recorded.
+        If `snapshot` is set (see `ABCDDB.snapshot()`), data is read from that
+        copy instead. External images are still resolved relative to `db_path`.
+        All queries run in a single read transaction (consistent view).
+        If `recordFilter` is set, only matching contacts are queried
+        (data fields without corresponding contact are skipped).
+        If `connection` is set (see `connect()`), it is used instead of a
+        new connection and is kept open (e.g., for repeated exports).
+        '''
+        if loader not in LOADERS:
+            raise ValueError(f'Unknown loader "{loader}". Use: {LOADERS}')
+        extImgDir = ABCDDB._imageDir(db_path, images)
+        db = connection or connect(snapshot or db_path)
+        db.execute('BEGIN')  # all cursors share one read transaction
+        try:
+            if loader == 'json':
+                records = ABCDDB._iterJSON(db, images, stats, recordFilter)
+            else:
+                records = ABCDDB._iterMerge(db, images, stats, recordFilter)
+            for rec in records:
+                try:
+                    with measure(stats, 'image'):
+                        rec.imagePreprocess(extImgDir, snapshot or db_path)
+                except Exception as e:
+                    print('''Could not extract image for contact: {}
+ reason: {}
+ skipping.'''.format(rec.fullname, e), file=sys.stderr)
+                yield rec
+        finally:
+            if connection:
+                db.execute('END')  # release read lock, allow checkpoints
+            else:
+                db.close()
 
-        db.close()
+    @staticmethod
+    @contextmanager
+    def snapshot(db_path: str) -> Iterator[str]:
+        '''
+        Consistent copy of the database (including changes in `-wal`) in a
+        temporary directory. Uses the SQLite backup API if available.
+        Yields the path of the copy, which is deleted on exit.
+        '''
+        tmp = tempfile.mkdtemp(prefix='abcddb-')
+        path = os.path.join(tmp, os.path.basename(db_path))
+        try:
+            src = connect(db_path)
+            try:
+                if hasattr(src, 'backup'):  # Python 3.7+
+                    dst = sqlite3.connect(path)
+                    src.backup(dst)
+                    dst.close()
+                else:
+                    for ext in ('', '-wal', '-shm'):
+                        if os.path.isfile(db_path + ext):
+                            shutil.copyfile(db_path + ext, path + ext)
+            finally:
+                src.close()
+            yield path
+        finally:
+            closeBlobConnections(path)  # do not keep deleted file open
+            shutil.rmtree(tmp, ignore_errors=True)
 
-        # support for externally referenced image files
+    @staticmethod
+    def imageDir(db_path: str) -> str:
+        ''' Directory of externally referenced image files. '''
         # relative to abcddb file: ".AddressBook-v22_SUPPORT/_EXTERNAL_DATA"
         dbBaseDir = os.path.dirname(os.path.abspath(db_path))
         dbFilename = os.path.basename(db_path)
         hiddenMediaDir = f'.{os.path.splitext(dbFilename)[0]}_SUPPORT'
-        extImgDir = os.path.join(dbBaseDir, hiddenMediaDir, '_EXTERNAL_DATA')
+        return os.path.join(dbBaseDir, hiddenMediaDir, '_EXTERNAL_DATA')
+
+    @staticmethod
+    def _imageDir(db_path: str, images: bool = True) -> str:
+        ''' Check for supplementary files. Returns external image dir. '''
+        extImgDir = ABCDDB.imageDir(db_path)
+        dbFilename = os.path.basename(db_path)
 
         if not os.path.isfile(db_path + '-wal'):
             print(f'[WARN] "{dbFilename}-wal" not found.',
@@ -525,17 +1092,138 @@ class ABCDDB:
                   'Data could be incomplete.',
                   file=sys.stderr)
 
-        if not os.path.isdir(extImgDir):
+        if images and not os.path.isdir(extImgDir):
+            hiddenMediaDir = os.path.basename(os.path.dirname(extImgDir))
             print(f'[WARN] Hidden folder "{hiddenMediaDir}" is missing.',
                   'Some images may not be exported (warnings below).',
                   file=sys.stderr)
+        return extImgDir
 
-        for rec in records.values():
-            try:
-                rec.imagePreprocess(extImgDir)
-            except Exception as e:
-                print('''Could not extract image for contact: {}
- reason: {}
- skipping.'''.format(rec.fullname, e), file=sys.stderr)
+    @staticmethod
+    def _query(
+        stats: Optional[Stats], typ: Any, *args: Any
+    ) -> Iterator[Any]:
+        ''' Run `typ.queryAll(*args)`, measured if `stats` is set. '''
+        if not stats:
+            return iter(typ.queryAll(*args))
+        phase = 'query ' + typ.__name__
+        with stats.measure(phase, count=0):  # execute() & sanitize()
+            result = typ.queryAll(*args)
+        return stats.wrap(phase, result)
+
+    @staticmethod
+    def _iterMerge(
+        db: sqlite3.Connection, images: bool, stats: Optional[Stats] = None,
+        recordFilter: Optional[RecordFilter] = None,
+    ) -> Iterator['Record']:
+        # each query needs its own cursor, all are consumed in parallel
+        where, params = ('', [])  # type: Tuple[str, List[Any]]
+        if recordFilter:
+            where, params = recordFilter.where(db.cursor())
+        records = _Peekable(ABCDDB._query(
+            stats, Record, db.cursor(), images, where, params))
+        attributes = [_Peekable(ABCDDB._query(
+            stats, x, db.cursor(), RecordFilter.owner(x.OWNER, where), params)
+        ) for x in ATTRIBUTE_TYPES]
+
+        # NULL owner is sorted first. Same as other orphans, but has no id
+        # to merge on. Yielded before the first orphan (or at the end).
+        noOwner = None  # type: Optional[Record]
+        for stream in attributes:
+            while stream.head and stream.head.parent is None:
+                orphan = stream.pop()
+                print('[WARN] Found unreferenced data field:', orphan,
+                      file=sys.stderr)
+                if not noOwner:
+                    noOwner = Record.initEmpty(None)  # type: ignore[arg-type]
+                noOwner.attach(orphan)
+
+        while True:
+            # next id is the smallest of all cursor heads
+            heads = [x.head.parent for x in attributes if x.head]
+            if records.head:
+                heads.append(records.head.id)
+            if not heads:
+                break
+            uid = min(heads)
+
+            if records.head and records.head.id == uid:
+                rec = records.pop()  # type: Record
+                isOrphan = False
+            else:
+                rec = Record.initEmpty(uid)
+                isOrphan = True
+                if noOwner:
+                    yield noOwner
+                    noOwner = None
+
+            for stream in attributes:
+                while stream.head and stream.head.parent == uid:
+                    attr = stream.pop()  # type: Queryable
+                    if isOrphan:
+                        print('[WARN] Found unreferenced data field:', attr,
+                              file=sys.stderr)
+                    rec.attach(attr)
+            yield rec
+        if noOwner:
+            yield noOwner
 
-        return list(records.values())
+    @staticmethod
+    def _iterJSON(
+        db: sqlite3.Connection, images: bool, stats: Optional[Stats] = None,
+        recordFilter: Optional[RecordFilter] = None,
+    ) -> Iterator['Record']:
+        cur = db.cursor()
+        where, params = recordFilter.where(cur) if recordFilter else ('', [])
+        z_ent = Record.contactEntity(cur)
+        numAttr = len(ATTRIBUTE_TYPES)
+
+        def _attrColumns(ref: str, op: str = '=') -> str:
+            ''' One correlated subquery per attribute table. '''
+            result = []
+            for typ in ATTRIBUTE_TYPES:
+                inner = sanitize(cur, typ.sql(
+                    where=f'{typ.OWNER} {op} {ref}',
+                    select=f'json_array({typ.COLUMNS}) AS obj'))
+                result.append('(SELECT json_group_array(json(obj)) FROM ({}))'
+                              .format(inner.rstrip(';')))
+            return ',\n'.join(result)
+
+        def _assemble(rec: Record, data: List[str], isOrphan: bool) -> Record:
+            for typ, values in zip(ATTRIBUTE_TYPES, data):
+                for x in json.loads(values):
+                    attr = typ([rec.id] + x)
+                    if isOrphan:
+                        print('[WARN] Found unreferenced data field:', attr,
+                              file=sys.stderr)
+                    rec.attach(attr)
+            return rec
+
+        query = sanitize(cur, f'''
+            SELECT {Record.columns(images)}, {{}}
+            FROM ZABCDRECORD
+            WHERE Z_ENT = ?{f' AND ({where})' if where else ''}
+            ORDER BY Z_PK;''').format(_attrColumns('ZABCDRECORD.Z_PK'))
+        rows = cur.execute(query, [z_ent] + params)  # type: Iterable[Any]
+        if stats:
+            rows = stats.wrap('query json', rows)
+        for row in rows:
+            yield _assemble(Record(row), row[-numAttr:], False)
+        if recordFilter:
+            return
+
+        # data fields which are not referenced by any contact (or NULL)
+        owners = ' UNION '.join('SELECT {} FROM {}{}'.format(
+            x.OWNER, x.TABLE, ' WHERE ' + x.WHERE if x.WHERE else '')
+            for x in ATTRIBUTE_TYPES)
+        rows = cur.execute(f'''
+            WITH owners(id) AS ({owners})
+            SELECT id, {_attrColumns('owners.id', 'IS')}
+            FROM owners
+            WHERE id IS NULL
+                OR id NOT IN (SELECT Z_PK FROM ZABCDRECORD WHERE Z_ENT = ?)
+            ORDER BY id;''', [z_ent])
+        if stats:
+            rows = stats.wrap('query json orphans', rows)
+        for row in rows:
+            yield _assemble(Record.initEmpty(row[0]), row[1:], True)
@@ -4,87 +4,895 @@ Extract data from AddressBook database (.abcddb) to Contacts VCards file (.vcf)
 '''
 import os
 import sys
-from io import TextIOWrapper
+import json
+import signal
+import sqlite3
+import shutil
+import tempfile
+import cProfile
+from datetime import datetime
+from glob import escape, glob
+from hashlib import sha1
 from pathlib import Path
-from argparse import ArgumentParser
+from argparse import ArgumentParser, Namespace
+from collections import deque
+from time import strftime
+from concurrent.futures import (
+    Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor)
+from itertools import islice
+from typing import (
+    Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set,
+    TextIO, Tuple, TypeVar)
 try:
-    from .ABCDDB import ABCDDB, Record
+    from .ABCDDB import (
+        ABCDDB, Record, RecordFilter, FilenameTemplate, LOADERS, SCHEMA_CACHE)
+    from .manifest import Manifest
+    from .filenames import FilenamePlan
+    from .stats import Stats, measure
+    from .writer import (
+        ArchiveWriter, FileWriter, Writer, compressor, isArchive, openText)
+    from .watch import Watcher
+    from .index import SearchIndex
+    from .duplicates import DuplicateFinder, merge
+    from .vcard2img import unescape
 except ImportError:  # fallback if not run as module
-    from ABCDDB import ABCDDB, Record  # type: ignore[import, no-redef]
+    from ABCDDB import (  # type: ignore[import, no-redef]
+        ABCDDB, Record, RecordFilter, FilenameTemplate, LOADERS, SCHEMA_CACHE)
+    from manifest import Manifest  # type: ignore[import, no-redef]
+    from filenames import FilenamePlan  # type: ignore[import, no-redef]
+    from stats import Stats, measure  # type: ignore[import, no-redef]
+    from writer import (  # type: ignore[import, no-redef]
+        ArchiveWriter, FileWriter, Writer, compressor, isArchive, openText)
+    from watch import Watcher  # type: ignore[import, no-redef]
+    from index import SearchIndex  # type: ignore[import, no-redef]
+    from duplicates import (  # type: ignore[import, no-redef]
+        DuplicateFinder, merge)
+    from vcard2img import unescape  # type: ignore[import, no-redef]
 
 DB_FILE = str(Path.home().joinpath(
     'Library', 'Application Support', 'AddressBook', 'AddressBook-v22.abcddb'))
+CHUNK_SIZE = 64  # number of records sent to a worker at once
+BUFFER_SIZE = 2 ** 20  # write buffer for single-file output
+
+T = TypeVar('T')
+
+
+def _renderChunk(records: List[Record]) -> List[Tuple[Optional[str], str]]:
+    ''' Returns `(vcard, '')` on success or `(None, error-message)`. '''
+    result = []  # type: List[Tuple[Optional[str], str]]
+    for rec in records:
+        try:
+            result.append((rec.makeVCard(), ''))
+        except Exception as e:
+            result.append((None, str(e)))
+    return result
+
+
+def writeRec(f: TextIO, rec: Record) -> bool:
+    ''' Stream vcard directly into file. Returns `True` on success. '''
+    try:
+        rec.writeVCard(f)
+        return True
+    except Exception as e:
+        print(f'Error processing contact {rec.id} {rec.fullname}: {e}',
+              file=sys.stderr)
+        return False
+
+
+def renderAll(
+    items: Iterable[Tuple[T, Record]],
+    jobs: int = 1,
+    stats: Optional[Stats] = None,
+) -> Iterator[Tuple[T, Record, Optional[str]]]:
+    '''
+    Render `(key, record)` pairs and yield `(key, record, vcard)`.
+    `vcard` is `None` if the record failed to process.
+    For `jobs > 1` rendering is done in a process pool (or a thread pool if
+    Python runs without GIL). Input is consumed in chunks and only a limited
+    number of chunks are in-flight at any time.
+    The output order is identical to the input order.
+    If `stats` is set, phase `render` records the time spent waiting for the
+    rendered vcards (for `jobs > 1` not the CPU time of the workers).
+    '''
+    def _results(chunk: List[Tuple[T, Record]], rendered: List[Tuple[
+            Optional[str], str]]) -> Iterator[Tuple[T, Record, Optional[str]]]:
+        for (key, rec), (vcard, err) in zip(chunk, rendered):
+            if vcard is None:
+                print(f'Error processing contact {rec.id} {rec.fullname}: '
+                      f'{err}', file=sys.stderr)
+            yield key, rec, vcard
+
+    if jobs < 1:
+        jobs = os.cpu_count() or 1
+    if jobs == 1:
+        for key, rec in items:
+            with measure(stats, 'render'):
+                rendered = _renderChunk([rec])
+            yield from _results([(key, rec)], rendered)
+        return
+
+    # free-threaded Python (3.13+) can render in threads without pickling
+    if not getattr(sys, '_is_gil_enabled', lambda: True)():
+        pool = ThreadPoolExecutor(max_workers=jobs)  # type: Executor
+    else:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+
+    with pool:
+        pending = deque()  # type: Deque[Tuple[List[Tuple[T, Record]], Future]]
+        it = iter(items)
+        while True:
+            # keep all workers busy, but limit memory usage
+            while len(pending) < jobs * 2:
+                chunk = list(islice(it, CHUNK_SIZE))
+                if not chunk:
+                    break
+                pending.append((chunk, pool.submit(
+                    _renderChunk, [rec for _, rec in chunk])))
+            if not pending:
+                break
+            chunk, future = pending.popleft()
+            with measure(stats, 'render', len(chunk)):
+                rendered = future.result()
+            yield from _results(chunk, rendered)
+
+
+def resolveFilename(
+    plan: FilenamePlan, filename: str, outDir: Path
+) -> Tuple[str, bool]:
+    ''' `plan.resolve()` and print collision info. '''
+    count = len(plan.collisions)
+    resolved, append = plan.resolve(filename)
+    if len(plan.collisions) == count:  # no collision
+        return resolved, append
+    if plan.mode == 'suffix':
+        print(f'INFO: "{outDir / filename}" exists, using "{resolved}"',
+              file=sys.stderr)
+    elif plan.mode == 'group':
+        print(f'INFO: appending to "{outDir / filename}"', file=sys.stderr)
+    else:
+        print(f'WARN: overwriting "{outDir / filename}"', file=sys.stderr)
+    return resolved, append
+
+
+def exportSingle(
+    db_path: str, args: Namespace, stats: Optional[Stats] = None,
+    snapshot: Optional[str] = None,
+    recordFilter: Optional[RecordFilter] = None,
+    connection: Optional[sqlite3.Connection] = None,
+) -> Tuple[int, int]:
+    '''
+    Export one database into a single file or (with `--split`) into
+    multiple files. Returns `(export_count, total_count)`.
+    '''
+    contacts = ABCDDB.iterRecords(db_path, args.loader,
+                                  images=not args.no_images, stats=stats,
+                                  snapshot=snapshot, recordFilter=recordFilter,
+                                  connection=connection)
+    # intermediate strings are needed to measure render & write separately
+    streaming = args.jobs == 1 and not stats
+    export_count = 0
+    total_count = 0
+
+    # choose which export mode to use
+    if args.split:  # multi-file mode
+        outDir = Path(args.output)
+        template = FilenameTemplate(args.split)
+        plan = FilenamePlan(args.collisions)
+        manifest = Manifest(args.output, {
+            'images': not args.no_images,
+            'format': args.split,
+            'collisions': args.collisions,
+        }) if args.incremental else None
+        update_count = 0
+
+        def planned() -> Iterator[Tuple[Tuple[Path, str, bool], Record]]:
+            nonlocal total_count, export_count
+            for rec in contacts:
+                total_count += 1
+                relname, append = resolveFilename(
+                    plan, template.apply(rec), outDir)
+                filename = outDir / relname
+                if manifest:  # incremental mode
+                    if manifest.isUnchanged(rec, relname):
+                        export_count += 1
+                        continue
+                elif args.dry_run:
+                    if not append:
+                        print(filename)
+                    continue
+                yield (filename, relname, append), rec
+
+        if isArchive(args.output):
+            writer = ArchiveWriter(args.output)  # type: Writer
+        else:
+            writer = FileWriter(args.io_threads)
+        try:
+            for (filename, relname, append), rec, vcard in renderAll(
+                    planned(), args.jobs, stats):
+                if vcard is None:
+                    if manifest:
+                        manifest.keep(rec)
+                    continue
+                export_count += 1
+                if manifest:
+                    if manifest.isSameContent(rec, relname, vcard):
+                        continue
+                    update_count += 1
+                    if args.dry_run:
+                        print(filename)
+                        continue
+                with measure(stats, 'write'):
+                    writer.write(filename, vcard, append)
+        finally:
+            with measure(stats, 'write', count=0):
+                writer.close()
+        if plan.collisions:
+            print(f'{len(plan.collisions)} filename collisions'
+                  f' ({plan.mode}).', file=sys.stderr)
+
+        if manifest:
+            if args.dry_run:
+                removed = manifest.obsoleteFiles()
+            else:
+                writer.makedirs(outDir)
+                removed = manifest.removeObsolete()
+                manifest.save()
+            for x in removed:
+                print(f'removed: "{outDir / x}"')
+            print(f'{update_count} updated, {len(removed)} removed.')
+    else:  # single-file mode
+        if args.dry_run:
+            print(args.output)
+            total_count = sum(1 for _ in contacts)
+        else:
+            def counted() -> Iterator[Tuple[None, Record]]:
+                nonlocal total_count
+                for rec in contacts:
+                    total_count += 1
+                    yield None, rec
+
+            with openText(args.output, BUFFER_SIZE) as f:
+                if streaming:  # no intermediate string
+                    for _, rec in counted():
+                        export_count += writeRec(f, rec)
+                else:
+                    for _, _, vcard in renderAll(
+                            counted(), args.jobs, stats):
+                        if vcard is not None:
+                            export_count += 1
+                            with measure(stats, 'write'):
+                                f.write(vcard)
+    return export_count, total_count
+
+
+def exportOnce(
+    db_path: str, args: Namespace, stats: Optional[Stats] = None,
+    recordFilter: Optional[RecordFilter] = None,
+    watcher: Optional[Watcher] = None,
+) -> Tuple[int, int]:
+    ''' `exportSingle()` from snapshot (`--snapshot`) or open connection. '''
+    if args.snapshot:
+        with ABCDDB.snapshot(db_path) as copy:
+            return exportSingle(db_path, args, stats, snapshot=copy,
+                                recordFilter=recordFilter)
+    return exportSingle(db_path, args, stats, recordFilter=recordFilter,
+                        connection=watcher.db if watcher else None)
+
+
+def watchExport(
+    watcher: Watcher, args: Namespace, stats: Optional[Stats] = None,
+    recordFilter: Optional[RecordFilter] = None,
+) -> None:
+    ''' Export again after each database change. Stops on Ctrl+C. '''
+    # stop gracefully if run as service
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    print(f'Watching "{watcher.dbPath}" for changes. Press Ctrl+C to stop.',
+          file=sys.stderr)
+    try:
+        for _ in watcher.changes(args.watch, args.debounce):
+            try:
+                export_count, total_count = exportOnce(
+                    watcher.dbPath, args, stats, recordFilter, watcher)
+            except Exception as e:  # keep watching, e.g., file locked
+                print(f'Error exporting "{watcher.dbPath}": {e}',
+                      file=sys.stderr)
+                continue
+            print(f'{strftime("%Y-%m-%d %H:%M:%S")}'
+                  f' {export_count}/{total_count} contacts.')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+# ===============================
+#   Batch export (multiple sources)
+# ===============================
+
+def discover(inputs: Iterable[str]) -> List[str]:
+    '''
+    Resolve input arguments to database files. Each argument can be a file,
+    a directory (searched recursively for `*.abcddb`) or a glob pattern.
+    '''
+    result = []  # type: List[str]
+    unique = set()  # type: Set[str]
+    for path in inputs:
+        if os.path.isfile(path):
+            found = [path]
+        elif os.path.isdir(path):
+            found = glob(os.path.join(escape(path), '**', '*.abcddb'),
+                         recursive=True)
+        else:
+            found = glob(path, recursive=True)
+        for x in sorted(found):
+            key = os.path.realpath(x)
+            if os.path.isfile(x) and key not in unique:
+                unique.add(key)
+                result.append(x)
+    return result
+
+
+CardInfo = Tuple[str, str, int]  # (filename, hash, size in bytes)
+
+
+def _renderSource(
+    db_path: str, spool: Optional[str], loader: str, images: bool,
+    split: Optional[str], snapshot: bool = False,
+    schemaCache: Optional[str] = None,
+    recordFilter: Optional[RecordFilter] = None,
+) -> Tuple[int, List[CardInfo]]:
+    '''
+    Render all contacts of one database (runs in worker process).
+    The vcards are written one after another into `spool` (utf-8), which
+    the parent process renames or copies to the output (skipped if `None`).
+    Returns number of contacts and `(filename, hash, size)` of each card.
+    `filename` is empty if `split` is not set.
+    '''
+    if schemaCache:
+        SCHEMA_CACHE.load(schemaCache)
+        try:
+            return _renderSource(db_path, spool, loader, images, split,
+                                 snapshot, recordFilter=recordFilter)
+        finally:
+            SCHEMA_CACHE.save(schemaCache)
+    if snapshot:
+        with ABCDDB.snapshot(db_path) as copy:
+            return _spoolRecords(ABCDDB.iterRecords(
+                db_path, loader, images, snapshot=copy,
+                recordFilter=recordFilter), db_path, spool, split)
+    return _spoolRecords(ABCDDB.iterRecords(
+        db_path, loader, images, recordFilter=recordFilter),
+        db_path, spool, split)
+
+
+def _spoolRecords(
+    records: Iterable[Record], db_path: str, spool: Optional[str],
+    split: Optional[str],
+) -> Tuple[int, List[CardInfo]]:
+    total = 0
+    result = []  # type: List[CardInfo]
+    fp = open(spool, 'wb', buffering=BUFFER_SIZE) if spool else None
+    try:
+        for rec in records:
+            total += 1
+            try:
+                data = rec.makeVCard().encode('utf-8')
+            except Exception as e:
+                print(f'Error processing contact {rec.id} {rec.fullname}'
+                      f' in "{db_path}": {e}', file=sys.stderr)
+                continue
+            if fp:
+                fp.write(data)
+            result.append((rec.formatFilename(split) if split else '',
+                           sha1(data).hexdigest(), len(data)))
+    finally:
+        if fp:
+            fp.close()
+    return total, result
+
+
+def _mapOrdered(
+    fn: Callable[..., Any], items: Iterable[Tuple], jobs: int
+) -> Iterator[Tuple[Tuple, Optional[Any], Optional[Exception]]]:
+    '''
+    Call `fn(*args)` for each item and yield `(args, result, error)`
+    in input order. Runs up to `jobs` items in parallel processes.
+    '''
+    if jobs == 1:
+        for args in items:
+            try:
+                yield args, fn(*args), None
+            except Exception as e:
+                yield args, None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()  # type: Deque[Tuple[Tuple, Future]]
+        it = iter(items)
+        while True:
+            # limit results held in memory
+            for args in islice(it, jobs * 2 - len(pending)):
+                pending.append((args, pool.submit(fn, *args)))
+            if not pending:
+                break
+            args, future = pending.popleft()
+            try:
+                yield args, future.result(), None
+            except Exception as e:
+                yield args, None, e
+
+
+def _writeSpool(
+    writer: FileWriter, spool: Optional[str], cards: List[CardInfo],
+    base: Path, split: Optional[str], seen: Optional[Set[str]],
+    plan: FilenamePlan, stats: Optional[Stats] = None,
+) -> Tuple[int, int]:
+    '''
+    Move rendered cards of one source from `spool` to `base.vcf` (or with
+    `split`, into directory `base`). If `seen` is set, cards with a hash in
+    `seen` are skipped. Dry-run if `spool` is `None`.
+    Returns `(export_count, duplicate_count)`.
+    '''
+    keep = [True] * len(cards)
+    if seen is not None:
+        for i, (_, digest, _) in enumerate(cards):
+            keep[i] = digest not in seen
+            seen.add(digest)
+    exported = sum(keep)
+    if not split and spool and all(keep):
+        with measure(stats, 'write', count=exported):
+            writer.makedirs(base.parent)
+            os.replace(spool, f'{base}.vcf')
+        return exported, 0
+    if not split and not spool:  # dry-run
+        return exported, len(cards) - exported
+
+    fp = None  # type: Optional[TextIO]
+    if not split and spool:
+        writer.makedirs(base.parent)
+        fp = open(f'{base}.vcf', 'w', buffering=BUFFER_SIZE)
+    src = open(spool, 'rb') if spool else None
+    try:
+        for (filename, _, size), isNew in zip(cards, keep):
+            vcard = src.read(size).decode('utf-8') if src else ''
+            if not isNew:
+                continue
+            if fp:
+                with measure(stats, 'write'):
+                    fp.write(vcard)
+                continue
+            filename, append = resolveFilename(plan, filename, base)
+            path = base / filename
+            if not src:  # dry-run
+                if not append:
+                    print(path)
+                continue
+            with measure(stats, 'write'):
+                writer.write(path, vcard, append)
+    finally:
+        if src:
+            src.close()
+        if fp:
+            fp.close()
+    return exported, len(cards) - exported
+
+
+def batchExport(
+    sources: List[str],
+    outDir: str,
+    *,
+    loader: str = LOADERS[0],
+    images: bool = True,
+    split: Optional[str] = None,
+    jobs: int = 1,
+    dedup: bool = False,
+    snapshot: bool = False,
+    schemaCache: Optional[str] = None,
+    ioThreads: int = 4,
+    collisions: str = FilenamePlan.MODES[0],
+    dryRun: bool = False,
+    stats: Optional[Stats] = None,
+    recordFilter: Optional[RecordFilter] = None,
+) -> Tuple[int, int]:
+    '''
+    Export multiple databases. Each source is rendered in a worker process
+    into a temporary file in `outDir` (only one card is held in memory).
+    Output paths mirror the input layout relative to the common parent dir:
+    `outDir/<relpath>.vcf` or with `split` `outDir/<relpath>/<split>`.
+    If `dedup` is set, contacts with identical vcard are only written once
+    (first source in sorted order wins).
+    If `recordFilter` is set, only matching contacts of each source are
+    exported.
+    Returns `(export_count, total_count)` over all sources.
+    '''
+    if jobs < 1:
+        jobs = os.cpu_count() or 1
+    root = os.path.commonpath(
+        [os.path.dirname(os.path.abspath(x)) for x in sources])
+    seen = set()  # type: Set[str]
+    export_count = 0
+    total_count = 0
+    dup_count = 0
+    failed = 0
+
+    spoolDir = None  # type: Optional[str]
+    if not dryRun:  # same file system as output, rename instead of copy
+        os.makedirs(outDir, exist_ok=True)
+        spoolDir = tempfile.mkdtemp(prefix='.abcddb2vcard-', dir=outDir)
+    work = ((x, os.path.join(spoolDir, f'{i}.vcf') if spoolDir else None,
+             loader, images, split, snapshot, schemaCache, recordFilter)
+            for i, x in enumerate(sources))
+    results = _mapOrdered(_renderSource, work, jobs)
+    try:
+        with FileWriter(ioThreads) as writer:
+            for (db_path, spool, *_), result, err in results:
+                if err or result is None:
+                    print(f'Error processing "{db_path}": {err}',
+                          file=sys.stderr)
+                    failed += 1
+                    continue
+                total, cards = result
+                name = os.path.splitext(os.path.relpath(
+                    os.path.abspath(db_path), root))[0]
+                base = Path(outDir) / name
+                if not split:
+                    print(f'{base}.vcf')
+                exported, duplicates = _writeSpool(
+                    writer, spool, cards, base, split, seen if dedup else None,
+                    FilenamePlan(collisions), stats)
+                print(f'{name}: {exported}/{total} contacts.' + (
+                    f' {duplicates} duplicates.' if dedup else ''),
+                    file=sys.stderr)
+                export_count += exported
+                total_count += total
+                dup_count += duplicates
+    finally:
+        if spoolDir:
+            shutil.rmtree(spoolDir, ignore_errors=True)
+
+    print(f'{len(sources) - failed}/{len(sources)} sources.' + (
+        f' {dup_count} duplicates skipped.' if dedup else ''))
+    return export_count, total_count
+
+
+# ===============================
+#   Search
+# ===============================
+
+def search(argv: List[str]) -> None:
+    ''' `abcddb2vcard search`: find contacts by phone, email or name. '''
+    cli = ArgumentParser(prog='abcddb2vcard search', description='''
+        Find contacts by phone number, email or name. Prints id and name of
+        each match. Without query, reads one query per line from stdin
+        (email if it contains @, phone number if it starts with a digit or
+        +, else name) and prints "query<TAB>id<TAB>name" per match.
+    ''')
+    cli.add_argument('-i', '--input', type=str, default=DB_FILE,
+                     metavar='AddressBook.abcddb',
+                     help='Specify another abcddb file.')
+    cli.add_argument('--phone', type=str, help='Phone number (any format).')
+    cli.add_argument('--email', type=str, help='Email address.')
+    cli.add_argument('--name', type=str,
+                     help='Words of name, nickname or organization.')
+    cli.add_argument('--prefix', action='store_true',
+                     help='Match incomplete phone, email or last name word.')
+    cli.add_argument('--country', type=str, default='', metavar='CODE',
+                     help='Calling code for national phone numbers,'
+                     ' e.g., 49 for Germany.')
+    cli.add_argument('--index', type=str, metavar='FILE',
+                     help='Persist index in FILE. Rebuilt automatically'
+                     ' if the database has changed.')
+    cli.add_argument('--vcard', action='store_true',
+                     help='Print vcards of matching contacts instead.')
+    args = cli.parse_args(argv)
+
+    if not os.path.isfile(args.input):
+        print('AddressBook "{}" does not exist.'.format(args.input),
+              file=sys.stderr)
+        exit(1)
+    if args.index:
+        index = SearchIndex.cached(args.index, args.input, args.country)
+    else:
+        index = SearchIndex.fromDB(args.input, args.country)
+
+    if args.phone or args.email or args.name:
+        ids = index.find(args.name or '', args.email or '', args.phone or '',
+                         args.prefix)
+        if args.vcard:
+            for rec in ABCDDB.iterRecords(
+                    args.input, recordFilter=RecordFilter(ids=ids)):
+                writeRec(sys.stdout, rec)
+        else:
+            for id in ids:
+                print(f'{id}\t{index.names[id]}')
+        if not ids:
+            exit(1)
+        return
+
+    for line in sys.stdin:
+        query = line.strip()
+        if not query:
+            continue
+        if '@' in query:
+            ids = index.find(email=query, prefix=args.prefix)
+        elif query[0].isdigit() or query[0] == '+':
+            ids = index.find(phone=query, prefix=args.prefix)
+        else:
+            ids = index.find(name=query, prefix=args.prefix)
+        for id in ids:
+            print(f'{query}\t{id}\t{index.names[id]}')
+        if not ids:
+            print(f'{query}\t\t')
+
+
+# ===============================
+#   Duplicates
+# ===============================
+
+def duplicates(argv: List[str]) -> None:
+    ''' `abcddb2vcard duplicates`: report (and merge) duplicate contacts. '''
+    cli = ArgumentParser(prog='abcddb2vcard duplicates', description='''
+        Find likely duplicate contacts (same email, same phone number and
+        similar name, or very similar name) and print a report.
+        The database is not modified.
+    ''')
+    cli.add_argument('-i', '--input', type=str, default=DB_FILE,
+                     metavar='AddressBook.abcddb',
+                     help='Specify another abcddb file.')
+    cli.add_argument('--country', type=str, default='', metavar='CODE',
+                     help='Calling code for national phone numbers,'
+                     ' e.g., 49 for Germany.')
+    cli.add_argument('--window', type=int, default=10, metavar='N',
+                     help='Compare each name with the next N names in'
+                     ' sorted order. Default: 10')
+    cli.add_argument('--threshold', type=float, default=0.9,
+                     help='Name similarity (0-1) for contacts without shared'
+                     ' email or phone. Default: 0.9')
+    cli.add_argument('--json', type=str, metavar='FILE',
+                     help='Save report as JSON.')
+    cli.add_argument('--merge', type=str, metavar='outfile.vcf',
+                     help='Write one merged vcard per duplicate group.')
+    args = cli.parse_args(argv)
+
+    if not os.path.isfile(args.input):
+        print('AddressBook "{}" does not exist.'.format(args.input),
+              file=sys.stderr)
+        exit(1)
+    finder = DuplicateFinder(args.country, args.window, args.threshold)
+    for rec in ABCDDB.iterRecords(args.input, images=bool(args.merge)):
+        finder.add(rec)
+    groups = finder.groups()
+
+    report = []
+    for ids, matches in groups:
+        print(f'{len(ids)} contacts:')
+        for id in ids:
+            print(f'  {id}\t{unescape(finder.records[id].fullname)}')
+        for (a, b), reason in matches:
+            print(f'  {a} = {b}: {reason}')
+        report.append({
+            'ids': ids,
+            'names': [unescape(finder.records[x].fullname) for x in ids],
+            'matches': [[a, b, reason] for (a, b), reason in matches],
+        })
+    print('{} duplicate groups ({} contacts) in {} contacts.'.format(
+        len(groups), sum(len(x[0]) for x in groups), len(finder.records)),
+        file=sys.stderr)
+
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump(report, fp, indent=2)
+    if args.merge:
+        with openText(args.merge, BUFFER_SIZE) as f:
+            for ids, _ in groups:
+                writeRec(f, merge([finder.records[x] for x in ids],
+                                  args.country))
+
+
+SUBCOMMANDS = {
+    'search': search,
+    'duplicates': duplicates,
+}  # type: Dict[str, Callable[[List[str]], None]]
+
+
+def parseDate(text: str) -> datetime:
+    ''' ISO 8601 date with optional time (local time). '''
+    for fmt in ('%Y-%m-%d', '%Y-%m-%dT%H:%M', '%Y-%m-%dT%H:%M:%S',
+                '%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    raise ValueError(f'Invalid date "{text}". Use YYYY-MM-DD[THH:MM[:SS]].')
 
 
 def main() -> None:
-    cli = ArgumentParser(description=__doc__)
-    cli.add_argument('output', type=str, metavar='outfile.vcf',
-                     help='VCard output file.')
+    if sys.argv[1:2] and sys.argv[1] in SUBCOMMANDS:
+        SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+    cli = ArgumentParser(description=__doc__, epilog='''
+        Subcommands: "%(prog)s search -h" to find contacts by phone, email
+        or name; "%(prog)s duplicates -h" to find duplicate contacts.
+    ''')
+    cli.add_argument('output', type=str, metavar='outfile.vcf', help='''
+        VCard output file. Compressed if it ends with .gz, .bz2, .xz or .zst.
+        With --split: output directory or .zip / .tar[.gz|.bz2|.xz] archive.
+    ''')
     cli.add_argument('-f', '--force', action='store_true',
                      help='Overwrite existing output file.')
     cli.add_argument('--dry-run', action='store_true',
                      help='Do not write file(s), just print filenames.')
     cli.add_argument('-i', '--input', type=str, metavar='AddressBook.abcddb',
-                     default=DB_FILE, help='Specify another abcddb input file.'
-                     ' Default: ' + DB_FILE)
+                     action='append', help='''
+        Specify another abcddb input file. Can be repeated, can be a directory
+        (searched recursively) or a glob pattern. With multiple databases,
+        output is a directory with one export per database.
+        Default: ''' + DB_FILE.replace('%', '%%'))
     cli.add_argument('-s', '--split', type=str, metavar='FORMAT', help='''
         Output into several vcf files instead of a single file.
         File format can use any field of type Record.
-        E.g. "%%{id}_%%{fullname}.vcf".
+        E.g. "%%{id}_%%{fullname}.vcf". Fields can have format specs:
+        a number (truncate), lower, upper, safe (replace special chars).
+        E.g. "%%{fullname:safe:40}.vcf".
+    ''')
+    cli.add_argument('--collisions', choices=FilenamePlan.MODES,
+                     default=FilenamePlan.MODES[0], help='''
+        Only with --split. If several contacts have the same filename:
+        "suffix" appends _2, _3, ... to the filename, "group" writes all of
+        them into one file, "overwrite" keeps only the last contact.
+        Default: suffix
+    ''')
+    cli.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                     help='Render vcards in N parallel processes.'
+                     ' Use 0 for number of CPUs. Default: 1')
+    cli.add_argument('--io-threads', type=int, default=4, metavar='N',
+                     help='Only with --split. Write files in N background'
+                     ' threads. Use 0 for synchronous writes. Default: 4')
+    cli.add_argument('--loader', choices=LOADERS, default=LOADERS[0],
+                     help='Query strategy. "merge": one query per table,'
+                     ' "json": one query with all fields grouped in SQLite.'
+                     ' Default: ' + LOADERS[0])
+    cli.add_argument('--no-images', action='store_true',
+                     help='Do not export contact images.')
+    cli.add_argument('--id', type=int, action='append', metavar='N',
+                     help='Only export contact with this id (Z_PK).'
+                     ' Can be repeated.')
+    cli.add_argument('--companies', choices=('only', 'exclude'),
+                     help='Only export companies or only persons.')
+    cli.add_argument('--modified-since', type=str, metavar='DATE',
+                     help='Only export contacts modified on or after DATE'
+                     ' (ISO 8601, e.g. 2024-01-31 or 2024-01-31T12:00).')
+    cli.add_argument('--group', type=str, metavar='NAME',
+                     help='Only export members of this contact group.')
+    cli.add_argument('--incremental', action='store_true', help='''
+        Only with --split. Keep a manifest in the output directory and only
+        rewrite files of changed contacts. Removes files of deleted contacts.
+    ''')
+    cli.add_argument('--dedup', action='store_true',
+                     help='Only with multiple inputs. Skip contacts which are'
+                     ' identical to a contact of a previous database.')
+    cli.add_argument('--snapshot', action='store_true',
+                     help='Export from a temporary copy of the database'
+                     ' (consistent, no interference with Contacts.app).')
+    cli.add_argument('--schema-cache', type=str, metavar='FILE',
+                     help='Persist database schema information in FILE.'
+                     ' Speeds up repeated exports of many small databases.')
+    cli.add_argument('--watch', type=float, nargs='?', const=2.0,
+                     metavar='SECONDS', help='''
+        Keep running and export again whenever the database changes
+        (polling interval, default: 2s). With --split, only files of
+        changed contacts are rewritten (implies --incremental).
     ''')
+    cli.add_argument('--debounce', type=float, default=1.0,
+                     metavar='SECONDS', help='With --watch, wait until the'
+                     ' database is unchanged for SECONDS. Default: 1')
+    cli.add_argument('--stats', action='store_true',
+                     help='Print time and row count per phase (query, image,'
+                     ' render, write) and peak memory usage.')
+    cli.add_argument('--stats-json', type=str, metavar='FILE',
+                     help='Same as --stats but save as JSON.')
+    cli.add_argument('--profile', type=str, metavar='FILE',
+                     help='Save cProfile output of the main process.'
+                     ' Inspect with "python -m pstats FILE".')
     args = cli.parse_args()
 
     # check input args
-    if not os.path.isfile(args.input):
-        print('AddressBook "{}" does not exist.'.format(args.input),
+    inputs = args.input or [DB_FILE]  # type: List[str]
+    isBatch = len(inputs) > 1 or not os.path.isfile(inputs[0])
+    sources = discover(inputs) if isBatch else inputs
+    hasFilter = args.id or args.companies or args.modified_since or args.group
+    if args.watch is not None and args.split and not (
+            isArchive(args.output) or args.collisions == 'group' or isBatch
+            or hasFilter):
+        args.incremental = True  # only rewrite files of changed contacts
+    if not sources:
+        print('AddressBook "{}" does not exist.'.format(' '.join(inputs)),
               file=sys.stderr)
         exit(1)
     elif not os.path.isdir(os.path.dirname(args.output) or os.curdir):
         print('Output parent directory does not exist.', file=sys.stderr)
         exit(1)
-    elif os.path.exists(args.output) and not args.force:
+    elif args.incremental and not args.split:
+        print('--incremental requires --split.', file=sys.stderr)
+        exit(1)
+    elif args.watch is not None and isBatch:
+        print('--watch supports only one input.', file=sys.stderr)
+        exit(1)
+    elif args.incremental and isBatch:
+        print('--incremental supports only one input.', file=sys.stderr)
+        exit(1)
+    elif isArchive(args.output) and (
+            not args.split or args.incremental or isBatch):
+        print('Archive output requires --split and a single input'
+              ' (no --incremental).', file=sys.stderr)
+        exit(1)
+    elif args.collisions == 'group' and (
+            args.incremental or isArchive(args.output)):
+        print('--collisions group cannot be used with --incremental'
+              ' or archive output.', file=sys.stderr)
+        exit(1)
+    elif os.path.exists(args.output) and not (args.force or args.incremental):
         print('Output file already exist. Use -f to force overwrite.',
               file=sys.stderr)
         exit(1)
+    try:
+        compressor(args.output)
+        if args.split:
+            FilenameTemplate(args.split)  # fail early on typos
+        recordFilter = RecordFilter(
+            ids=args.id,
+            company={'only': True, 'exclude': False}.get(args.companies),
+            modifiedSince=parseDate(args.modified_since).timestamp()
+            if args.modified_since else None,
+            group=args.group)
+    except (ImportError, ValueError) as e:
+        print(e, file=sys.stderr)
+        exit(1)
+    if recordFilter and args.incremental:
+        print('--incremental cannot be used with --id, --companies,'
+              ' --modified-since or --group.', file=sys.stderr)
+        exit(1)
 
-    # perform export
-    contacts = ABCDDB.load(args.input)
-    export_count = 0
+    stats = Stats() if args.stats or args.stats_json else None
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
 
-    # reused for appending to an open file
-    def writeRec(f: TextIOWrapper, rec: Record):
-        nonlocal export_count
+    if isBatch:
+        export_count, total_count = batchExport(
+            sources, args.output, loader=args.loader,
+            images=not args.no_images, split=args.split, jobs=args.jobs,
+            dedup=args.dedup, snapshot=args.snapshot,
+            schemaCache=args.schema_cache, ioThreads=args.io_threads,
+            collisions=args.collisions, dryRun=args.dry_run, stats=stats,
+            recordFilter=recordFilter)
+        print(f'{export_count}/{total_count} contacts.')
+    else:
+        if args.schema_cache:
+            SCHEMA_CACHE.load(args.schema_cache)
+        # open before first export, so that no change is missed
+        watcher = Watcher(sources[0]) if args.watch is not None else None
         try:
-            f.write(rec.makeVCard())
-            export_count += 1
-        except Exception as e:
-            print(f'Error processing contact {rec.id} {rec.fullname}: {e}',
-                  file=sys.stderr)
+            export_count, total_count = exportOnce(
+                sources[0], args, stats, recordFilter, watcher)
+        except ValueError as e:  # e.g., no group table
+            print(e, file=sys.stderr)
+            exit(1)
+        print(f'{export_count}/{total_count} contacts.')
+        if watcher:
+            watchExport(watcher, args, stats, recordFilter)
+        if args.schema_cache:
+            SCHEMA_CACHE.save(args.schema_cache)
 
-    # choose which export mode to use
-    if args.split:  # multi-file mode
-        outDir = Path(args.output)
-        prevFilenames = set()
-        for rec in contacts:
-            filename = outDir / Path(rec.formatFilename(args.split))
-            if filename in prevFilenames:
-                print(f'WARN: overwriting "{filename}"', file=sys.stderr)
-            prevFilenames.add(filename)
-
-            os.makedirs(filename.parent, exist_ok=True)
-            if args.dry_run:
-                print(filename)
-            else:
-                with open(filename, 'w') as f:
-                    writeRec(f, rec)
-    else:  # single-file mode
-        if args.dry_run:
-            print(args.output)
-        else:
-            with open(args.output, 'w') as f:
-                for rec in contacts:
-                    writeRec(f, rec)
-    print(f'{export_count}/{len(contacts)} contacts.')
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+    if stats:
+        if args.stats:
+            print(stats.summary(), file=sys.stderr)
+        if args.stats_json:
+            with open(args.stats_json, 'w') as fp:
+                json.dump(stats.asDict(), fp, indent=2)
 
 
 if __name__ == '__main__':
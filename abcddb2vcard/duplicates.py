@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+'''
+Find (and merge) duplicate contacts.
+'''
+from difflib import SequenceMatcher
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+try:
+    from .ABCDDB import Record
+    from .index import normEmail, normPhone, words
+except ImportError:  # fallback if not run as module
+    from ABCDDB import Record  # type: ignore[import, no-redef]
+    from index import (  # type: ignore[import, no-redef]
+        normEmail, normPhone, words)
+
+Pair = Tuple[int, int]  # (smaller id, larger id)
+
+
+def nameKey(rec: Record) -> str:
+    ''' Normalized name, word order ignored (`Doe, John` == `John Doe`). '''
+    return ' '.join(sorted(words(rec.fullname)))
+
+
+def similarity(a: str, b: str, minimum: float = 0.0) -> float:
+    '''
+    Ratio of matching characters (0-1). Returns 0 early if the (cheap)
+    upper bounds are already below `minimum`.
+    '''
+    if not a or not b:
+        return 0.0
+    matcher = SequenceMatcher(None, a, b)
+    if matcher.real_quick_ratio() < minimum or \
+            matcher.quick_ratio() < minimum:
+        return 0.0
+    return matcher.ratio()
+
+
+class _UnionFind:
+    def __init__(self) -> None:
+        self.parent = {}  # type: Dict[int, int]
+
+    def find(self, x: int) -> int:
+        root = self.parent.setdefault(x, x)
+        while root != self.parent[root]:
+            root = self.parent[root]
+        while x != root:  # path compression
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)  # smallest id is root
+
+
+class DuplicateFinder:
+    '''
+    Find likely duplicates in near-linear time. Candidate pairs come from:
+    - blocking: records sharing a normalized email, phone number or
+        name + organization are compared (keys with more than `maxBlock`
+        records are ignored, e.g., a company switchboard number).
+    - sorted neighborhood: records sorted by `nameKey()` are compared with
+        the next `window` records (similar names, e.g., typos).
+    A candidate pair is a duplicate if both have the same email, or the
+    same phone number and a name similarity of at least `phoneThreshold`,
+    or a name similarity of at least `threshold` (and no different
+    organization).
+    '''
+
+    def __init__(
+        self, country: str = '', window: int = 10, threshold: float = 0.9,
+        phoneThreshold: float = 0.6, maxBlock: int = 50,
+    ) -> None:
+        self.country = country
+        self.window = window
+        self.threshold = threshold
+        self.phoneThreshold = phoneThreshold
+        self.maxBlock = maxBlock
+        self.records = {}  # type: Dict[int, Record]
+        self._names = {}  # type: Dict[int, str]
+        self._orgs = {}  # type: Dict[int, str]
+        self._emails = {}  # type: Dict[int, Set[str]]
+        self._phones = {}  # type: Dict[int, Set[str]]
+
+    def add(self, rec: Record) -> None:
+        ''' Skips data fields without owner (`rec.id` is `None`). '''
+        if rec.id is None:
+            return
+        self.records[rec.id] = rec
+        self._names[rec.id] = nameKey(rec)
+        self._orgs[rec.id] = ' '.join(words(rec.organization))
+        self._emails[rec.id] = {normEmail(x.email) for x in rec.email} - {''}
+        self._phones[rec.id] = {
+            normPhone(x.number, self.country) for x in rec.phone} - {''}
+
+    def candidates(self) -> Set[Pair]:
+        ''' Pairs which share a blocking key or are sorted neighbors. '''
+        blocks = {}  # type: Dict[Tuple[str, str], List[int]]
+        for id in self.records:
+            keys = [('email', x) for x in self._emails[id]]
+            keys += [('phone', x) for x in self._phones[id]]
+            if self._names[id]:
+                keys.append(('name', self._names[id] + '|' + self._orgs[id]))
+            for key in keys:
+                blocks.setdefault(key, []).append(id)
+
+        pairs = set()  # type: Set[Pair]
+        for ids in blocks.values():
+            if 1 < len(ids) <= self.maxBlock:
+                for i, a in enumerate(ids):
+                    for b in ids[i + 1:]:
+                        pairs.add((min(a, b), max(a, b)))
+
+        ordered = sorted((x for x in self.records if self._names[x]),
+                         key=self._names.__getitem__)
+        for i, a in enumerate(ordered):
+            for b in ordered[i + 1:i + 1 + self.window]:
+                pairs.add((min(a, b), max(a, b)))
+        return pairs
+
+    def match(self, a: int, b: int) -> str:
+        ''' Reason why `a` and `b` are duplicates, empty if they are not. '''
+        shared = self._emails[a] & self._emails[b]
+        if shared:
+            return 'email ' + min(shared)
+        shared = self._phones[a] & self._phones[b]
+        orgA, orgB = self._orgs[a], self._orgs[b]
+        if shared:
+            minimum = min(self.phoneThreshold, self.threshold)
+        elif not orgA or not orgB or orgA == orgB:
+            minimum = self.threshold
+        else:
+            return ''  # different organization and nothing in common
+        score = similarity(self._names[a], self._names[b], minimum)
+        if shared and score >= self.phoneThreshold:
+            return 'phone {} & name {:.0%}'.format(min(shared), score)
+        if score >= self.threshold and (not orgA or not orgB or orgA == orgB):
+            return 'name {:.0%}'.format(score)
+        return ''
+
+    def groups(self) -> List[Tuple[List[int], List[Tuple[Pair, str]]]]:
+        '''
+        Returns duplicate groups (sorted ids) and matching pairs with
+        reason. Groups are transitive: a = b and b = c puts a, b, c together.
+        '''
+        uf = _UnionFind()
+        reasons = []  # type: List[Tuple[Pair, str]]
+        for a, b in sorted(self.candidates()):
+            reason = self.match(a, b)
+            if reason:
+                uf.union(a, b)
+                reasons.append(((a, b), reason))
+        members = {}  # type: Dict[int, List[int]]
+        for id in sorted(uf.parent):
+            members.setdefault(uf.find(id), []).append(id)
+        matches = {}  # type: Dict[int, List[Tuple[Pair, str]]]
+        for pair, reason in reasons:
+            matches.setdefault(uf.find(pair[0]), []).append((pair, reason))
+        return [(ids, matches[root]) for root, ids in sorted(members.items())]
+
+
+# ===============================
+#   Merge
+# ===============================
+
+def _unique(items: Iterable[Any], key: Callable[[Any], Any]) -> List[Any]:
+    seen = set()  # type: Set[Any]
+    result = []
+    for x in items:
+        k = key(x)
+        if k not in seen:
+            seen.add(k)
+            result.append(x)
+    return result
+
+
+def merge(records: List[Record], country: str = '') -> Record:
+    '''
+    Combine records into the first one (in place), e.g., the oldest
+    record of a duplicate group. Empty fields are taken
+    from the other records, data fields are joined without duplicates.
+    '''
+    base = records[0]
+    others = records[1:]
+    for field in ('firstname', 'lastname', 'middlename', 'nameprefix',
+                  'namesuffix', 'nickname', 'maidenname',
+                  'phonetic_firstname', 'phonetic_middlename',
+                  'phonetic_lastname', 'phonetic_org', 'organization',
+                  'department', 'jobtitle', 'bday', 'image'):
+        if not getattr(base, field):
+            for rec in others:
+                if getattr(rec, field):
+                    setattr(base, field, getattr(rec, field))
+                    break
+    every = [base] + others
+    base.email = _unique((x for r in every for x in r.email),
+                         lambda x: normEmail(x.email))
+    base.phone = _unique((x for r in every for x in r.phone),
+                         lambda x: normPhone(x.number, country))
+    base.address = _unique((x for r in every for x in r.address),
+                           lambda x: x.asPrintable().lower())
+    base.socialprofile = _unique(
+        (x for r in every for x in r.socialprofile),
+        lambda x: (x.service.lower(), x.user.lower()))
+    base.urls = _unique((x for r in every for x in r.urls),
+                        lambda x: x.url.lower())
+    base.service = _unique((x for r in every for x in r.service),
+                           lambda x: (x.service, x.username.lower()))
+    notes = _unique((r.note for r in every if r.note), lambda x: x)
+    base.note = '\\n\\n'.join(notes) or None  # escaped newline (x520)
+    return base
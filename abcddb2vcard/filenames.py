@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+'''
+Filename collision handling for multi-file export.
+'''
+import os
+import unicodedata
+from typing import Dict, List, Tuple
+
+
+class FilenamePlan:
+    '''
+    Resolve filename collisions deterministically (in input order).
+    Names are compared case-insensitive and unicode normalized, same as the
+    default file systems of macOS and Windows.
+    Modes:
+    - `suffix`: append `_2`, `_3`, ... before the file extension.
+    - `group`: contacts with the same filename are written into one file.
+    - `overwrite`: last contact wins (files of previous contacts are lost).
+    '''
+    MODES = ('suffix', 'group', 'overwrite')
+
+    def __init__(self, mode: str = 'suffix') -> None:
+        if mode not in self.MODES:
+            raise ValueError(f'Unknown mode "{mode}". Use: {self.MODES}')
+        self.mode = mode
+        self._used = {}  # type: Dict[str, int]  # name -> last used suffix
+        self.collisions = []  # type: List[Tuple[str, str]]  # (name, used)
+
+    @staticmethod
+    def key(name: str) -> str:
+        return unicodedata.normalize('NFC', name).casefold()
+
+    def resolve(self, name: str) -> Tuple[str, bool]:
+        '''
+        Returns `(filename, append)`. `append` is `True` if the vcard
+        should be appended to the file of a previous contact (mode `group`).
+        '''
+        key = self.key(name)
+        if key not in self._used:
+            self._used[key] = 1
+            return name, False
+
+        if self.mode != 'suffix':
+            self.collisions.append((name, name))
+            return name, self.mode == 'group'
+
+        base, ext = os.path.splitext(name)
+        if not ext and os.path.basename(name).startswith('.'):
+            # empty field, e.g. `.vcf` -> `_2.vcf` (not hidden `.vcf_2`)
+            base = name[:len(name) - len(os.path.basename(name))]
+            ext = os.path.basename(name)
+        num = self._used[key]
+        while True:
+            num += 1
+            candidate = f'{base}_{num}{ext}'
+            if self.key(candidate) not in self._used:
+                break
+        self._used[key] = num
+        self._used[self.key(candidate)] = 1
+        self.collisions.append((name, candidate))
+        return candidate, False
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+'''
+Lookup index over normalized phone numbers, email addresses and names.
+'''
+import os
+import re
+import json
+import unicodedata
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional
+try:
+    from .ABCDDB import ABCDDB, Record
+except ImportError:  # fallback if not run as module
+    from ABCDDB import ABCDDB, Record  # type: ignore[import, no-redef]
+
+rx_word = re.compile(r'\w+')
+rx_phone = re.compile(r'[^\d+]')  # keep digits and plus sign
+rx_trunk = re.compile(r'\(\s*0\s*\)')  # `+49 (0) 171`
+
+
+def normPhone(number: str, country: str = '') -> str:
+    '''
+    Normalize to E.164-like format (`+<country><number>`), e.g.,
+    `+49 (171) 123-45` and `0049 17112345` become `+4917112345`.
+    National numbers (single leading `0`) are prefixed with `country`
+    (calling code without `+`, e.g., `49`). If no `country` is given,
+    national numbers are returned as digits only.
+    A trunk prefix `(0)` after the country code is dropped.
+    '''
+    number = number.replace('\\', '').strip()
+    if number.startswith(('+', '00')):
+        number = rx_trunk.sub('', number)
+    number = rx_phone.sub('', number)
+    if number.startswith('+'):
+        return '+' + number[1:].replace('+', '')
+    number = number.replace('+', '')
+    if number.startswith('00'):
+        return '+' + number[2:]
+    if number.startswith('0') and country:
+        return '+' + country + number[1:]
+    return number
+
+
+def normEmail(email: str) -> str:
+    return email.replace('\\', '').strip().lower()
+
+
+def words(text: str) -> List[str]:
+    ''' Lowercase words without accents, e.g., `Müller-Lüdenscheidt`. '''
+    text = unicodedata.normalize('NFKD', text.replace('\\', ' '))
+    text = ''.join(x for x in text if not unicodedata.combining(x))
+    return rx_word.findall(text.casefold())
+
+
+def fileSignature(db_path: str) -> List[Any]:
+    ''' Size and mtime of database and `-wal` file (detect changes). '''
+    result = []  # type: List[Any]
+    for path in (db_path, db_path + '-wal'):
+        try:
+            st = os.stat(path)
+            result.append([st.st_size, st.st_mtime_ns])
+        except OSError:
+            result.append(None)
+    return result
+
+
+class _KeyIndex:
+    ''' Hash index (exact match) and sorted keys (prefix match). '''
+    __slots__ = ('ids', '_sorted')
+
+    def __init__(self, ids: Optional[Dict[str, List[int]]] = None) -> None:
+        self.ids = ids or {}  # type: Dict[str, List[int]]
+        self._sorted = None  # type: Optional[List[str]]
+
+    def add(self, key: str, id: int) -> None:
+        if key:
+            ids = self.ids.setdefault(key, [])
+            if not ids or ids[-1] != id:
+                ids.append(id)
+            self._sorted = None
+
+    def get(self, key: str) -> List[int]:
+        return self.ids.get(key, [])
+
+    def prefix(self, key: str) -> List[int]:
+        ''' All ids of keys starting with `key`. '''
+        if self._sorted is None:
+            self._sorted = sorted(self.ids)
+        result = []  # type: List[int]
+        keys = self._sorted
+        i = bisect_left(keys, key)
+        while i < len(keys) and keys[i].startswith(key):
+            result.extend(self.ids[keys[i]])
+            i += 1
+        return result
+
+
+class SearchIndex:
+    '''
+    Map normalized phone numbers (`normPhone()`), emails (`normEmail()`)
+    and name words (`words()`) to `Record.id`. Exact lookups are O(1),
+    prefix lookups O(log n) plus the number of matching keys.
+    Can be persisted with `save()` and `load()`.
+    '''
+    VERSION = 2  # normPhone() changed
+
+    def __init__(self, country: str = '') -> None:
+        self.country = country
+        self.names = {}  # type: Dict[int, str]  # id -> fullname
+        self.phone = _KeyIndex()
+        self.email = _KeyIndex()
+        self.name = _KeyIndex()
+        self.source = None  # type: Optional[List[Any]]  # fileSignature()
+
+    def add(self, rec: Record) -> None:
+        ''' Skips data fields without owner (`rec.id` is `None`). '''
+        if rec.id is None:
+            return
+        self.names[rec.id] = rec.fullname.replace('\\,', ',').replace(
+            '\\;', ';')  # undo vcard escaping
+        for phone in rec.phone:
+            self.phone.add(normPhone(phone.number, self.country), rec.id)
+        for email in rec.email:
+            self.email.add(normEmail(email.email), rec.id)
+        for word in sorted(set(words(' '.join(filter(None, (
+                rec.fullname, rec.nickname, rec.organization)))))):
+            self.name.add(word, rec.id)
+
+    @staticmethod
+    def build(records: Iterable[Record], country: str = '') -> 'SearchIndex':
+        index = SearchIndex(country)
+        for rec in records:
+            index.add(rec)
+        return index
+
+    @staticmethod
+    def fromDB(db_path: str, country: str = '') -> 'SearchIndex':
+        ''' Build index from database (image data is not queried). '''
+        source = fileSignature(db_path)
+        index = SearchIndex.build(
+            ABCDDB.iterRecords(db_path, images=False), country)
+        index.source = source
+        return index
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def find(
+        self, name: str = '', email: str = '', phone: str = '',
+        prefix: bool = False,
+    ) -> List[int]:
+        '''
+        Ids of contacts matching all given conditions (sorted).
+        `name` can have multiple words, each has to match. With `prefix`,
+        the (last) word, email or phone number may be incomplete.
+        '''
+        conditions = []  # type: List[List[int]]
+        if phone:
+            key = normPhone(phone, self.country)
+            conditions.append(
+                self.phone.prefix(key) if prefix else self.phone.get(key))
+        if email:
+            key = normEmail(email)
+            conditions.append(
+                self.email.prefix(key) if prefix else self.email.get(key))
+        parts = words(name)
+        for i, word in enumerate(parts):
+            isLast = i == len(parts) - 1
+            conditions.append(self.name.prefix(word) if prefix and isLast
+                              else self.name.get(word))
+        if not conditions:
+            return []
+        found = set(conditions[0])
+        for ids in conditions[1:]:
+            found.intersection_update(ids)
+        return sorted(found)
+
+    # Persistence
+
+    def save(self, path: str) -> None:
+        ''' Write index to JSON file (atomic). '''
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as fp:
+            json.dump({
+                'version': self.VERSION,
+                'country': self.country,
+                'source': self.source,
+                'names': self.names,
+                'phone': self.phone.ids,
+                'email': self.email.ids,
+                'name': self.name.ids,
+            }, fp, separators=(',', ':'))
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load(path: str) -> Optional['SearchIndex']:
+        ''' Returns `None` if file is missing or invalid. '''
+        try:
+            with open(path, 'r') as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != SearchIndex.VERSION:
+            return None
+        index = SearchIndex(data['country'])
+        index.source = data['source']
+        index.names = {int(k): v for k, v in data['names'].items()}
+        index.phone = _KeyIndex(data['phone'])
+        index.email = _KeyIndex(data['email'])
+        index.name = _KeyIndex(data['name'])
+        return index
+
+    @staticmethod
+    def cached(path: str, db_path: str, country: str = '') -> 'SearchIndex':
+        '''
+        Load index from `path` if it matches the current database file,
+        otherwise rebuild and save it.
+        '''
+        index = SearchIndex.load(path)
+        if index and index.country == country and \
+                index.source == fileSignature(db_path):
+            return index
+        index = SearchIndex.fromDB(db_path, country)
+        index.save(path)
+        return index
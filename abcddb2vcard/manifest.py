@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+'''
+Change-tracking manifest for incremental multi-file export.
+'''
+import os
+import json
+from hashlib import sha1
+from typing import Dict, Any, Optional, Set, List
+try:
+    from . import __version__
+    from .ABCDDB import Record
+except ImportError:  # fallback if not run as module
+    from ABCDDB import Record  # type: ignore[import, no-redef]
+    __version__ = None  # type: ignore[assignment]
+
+
+class Manifest:
+    FILENAME = '.abcddb2vcard-manifest.json'
+
+    def __init__(
+        self, outDir: str, options: Optional[Dict[str, Any]] = None
+    ) -> None:
+        '''
+        `options` are all export settings which change the output (e.g.,
+        images, filename format). If they differ from the previous run,
+        every record is rendered again (files are only rewritten if the
+        content changed).
+        '''
+        self.outDir = outDir
+        self.path = os.path.join(outDir, Manifest.FILENAME)
+        self.options = dict(options or {}, version=__version__)
+        self._old = {}  # type: Dict[str, Dict[str, Any]]
+        self._new = {}  # type: Dict[str, Dict[str, Any]]
+        if os.path.isfile(self.path):
+            with open(self.path, 'r') as fp:
+                data = json.load(fp)
+            self._old = data.get('records', {})
+            if data.get('options') != self.options:
+                for entry in self._old.values():
+                    entry.pop('modified', None)  # mark as stale
+
+    @staticmethod
+    def hash(vcard: str) -> str:
+        return sha1(vcard.encode('utf-8')).hexdigest()
+
+    def _entry(self, rec: Record, filename: str) -> Dict[str, Any]:
+        entry = self._old.get(str(rec.id))
+        if entry and entry['file'] == filename and \
+                os.path.isfile(os.path.join(self.outDir, filename)):
+            return entry
+        return {}
+
+    def isUnchanged(self, rec: Record, filename: str) -> bool:
+        '''
+        Compare modification timestamp with previous run.
+        If unchanged, the record is kept and needs no re-rendering.
+        '''
+        entry = self._entry(rec, filename)
+        if rec.modified is None or entry.get('modified') != rec.modified:
+            return False
+        self._new[str(rec.id)] = entry
+        return True
+
+    def isSameContent(self, rec: Record, filename: str, vcard: str) -> bool:
+        ''' Update record entry. Return `True` if file content is the same. '''
+        entry = self._entry(rec, filename)
+        digest = Manifest.hash(vcard)
+        self._new[str(rec.id)] = {
+            'file': filename, 'hash': digest, 'modified': rec.modified}
+        return entry.get('hash') == digest
+
+    def keep(self, rec: Record) -> None:
+        ''' Retain previous entry (e.g., if the record failed to export). '''
+        if str(rec.id) in self._old:
+            self._new[str(rec.id)] = self._old[str(rec.id)]
+
+    def obsoleteFiles(self) -> List[str]:
+        ''' Files of removed (or renamed) records, relative to `outDir`. '''
+        current = {x['file'] for x in self._new.values()}  # type: Set[str]
+        return sorted({x['file'] for x in self._old.values()} - current)
+
+    def removeObsolete(self) -> List[str]:
+        ''' Delete obsolete files from disk. Returns list of removed files. '''
+        removed = []
+        for filename in self.obsoleteFiles():
+            path = os.path.join(self.outDir, filename)
+            if os.path.isfile(path):
+                os.remove(path)
+                removed.append(filename)
+        return removed
+
+    def save(self) -> None:
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as fp:
+            json.dump({'version': 1, 'options': self.options,
+                       'records': self._new}, fp, indent=0, sort_keys=True)
+        os.replace(tmp, self.path)
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+'''
+Serve contacts of an AddressBook database (.abcddb) over HTTP (read-only)
+'''
+import os
+import re
+import sys
+import json
+import signal
+import threading
+from io import TextIOWrapper
+from pathlib import Path
+from argparse import ArgumentParser
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Tuple, cast
+try:
+    from .ABCDDB import ABCDDB, Record, unx520
+    from .index import SearchIndex
+    from .watch import Watcher
+except ImportError:  # fallback if not run as module
+    from ABCDDB import (  # type: ignore[import, no-redef]
+        ABCDDB, Record, unx520)
+    from index import SearchIndex  # type: ignore[import, no-redef]
+    from watch import Watcher  # type: ignore[import, no-redef]
+
+DB_FILE = str(Path.home().joinpath(
+    'Library', 'Application Support', 'AddressBook', 'AddressBook-v22.abcddb'))
+
+rx_card = re.compile(r'^/contacts/(\d+)\.vcf$')
+
+
+# ===============================
+#   Index & cache
+# ===============================
+
+class ContactIndex:
+    '''
+    All records of a database by id and a `SearchIndex` to find them by
+    email, phone number and name. Images are not loaded into memory.
+    Data fields without owner (`rec.id` is `None`) are skipped.
+    '''
+
+    def __init__(self, records: Iterable[Record], country: str = '') -> None:
+        self.byId = {}  # type: Dict[int, Record]
+        self.lookup = SearchIndex(country)
+        for rec in records:
+            if rec.id is None:
+                continue
+            self.byId[rec.id] = rec
+            self.lookup.add(rec)
+
+    def __len__(self) -> int:
+        return len(self.byId)
+
+    def get(self, id: int) -> Optional[Record]:
+        return self.byId.get(id)
+
+    def search(
+        self, name: str = '', email: str = '', phone: str = '',
+        prefix: bool = False,
+    ) -> List[Record]:
+        ''' Contacts matching all given conditions, sorted by id. '''
+        return [self.byId[x] for x in self.lookup.find(
+            name, email, phone, prefix) if x in self.byId]
+
+
+def summary(rec: Record) -> Dict[str, Any]:
+    ''' Search result. Names as stored in the database (not escaped). '''
+    return {
+        'id': rec.id,
+        'fullname': unx520(rec.fullname) or '',
+        'firstname': unx520(rec.firstname) or '',
+        'lastname': unx520(rec.lastname) or '',
+        'organization': unx520(rec.organization) or '',
+        'iscompany': rec.iscompany,
+        'url': f'/contacts/{rec.id}.vcf',
+    }
+
+
+class LRUCache:
+    ''' Thread-safe least recently used cache with fixed size. '''
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # type: OrderedDict[Any, Any]
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ContactStore:
+    '''
+    Loads a database once and keeps `ContactIndex` and rendered vcards in
+    memory. `watch()` reloads the index (and clears the cache) whenever
+    the database changes.
+    '''
+
+    def __init__(
+        self, db_path: str, cacheSize: int = 1024, country: str = ''
+    ) -> None:
+        self.dbPath = db_path
+        self.country = country
+        self.cache = LRUCache(cacheSize)
+        self.index = ContactIndex(())
+        self.reload()
+
+    def reload(self) -> None:
+        index = ContactIndex(ABCDDB.iterRecords(self.dbPath), self.country)
+        self.index = index  # atomic swap, requests keep their reference
+        self.cache.clear()
+
+    def vcard(self, rec: Record) -> str:
+        # keyed by object, a reload creates new records (no stale entries)
+        vcard = self.cache.get(rec)  # type: Optional[str]
+        if vcard is None:
+            vcard = rec.makeVCard()
+            self.cache.put(rec, vcard)
+        return vcard
+
+    def watch(self, interval: float = 2.0) -> threading.Thread:
+        ''' Start background thread which reloads on database change. '''
+        def run() -> None:
+            watcher = Watcher(self.dbPath)  # connection is per thread
+            for _ in watcher.changes(interval):
+                try:
+                    self.reload()
+                except Exception as e:  # keep serving previous data
+                    print(f'Reload failed: {e}', file=sys.stderr)
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+
+# ===============================
+#   HTTP server
+# ===============================
+
+class Handler(BaseHTTPRequestHandler):
+    '''
+    - `GET /contacts.vcf`: all contacts (streamed)
+    - `GET /contacts/<id>.vcf`: single contact
+    - `GET /search?name=..&email=..&phone=..`: matching contacts (JSON),
+        add `&prefix=1` to match incomplete values
+    - `GET /status`: number of contacts and cache statistics (JSON)
+    '''
+    store = None  # type: ContactStore  # type: ignore[assignment]
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        index = self.store.index
+        match = rx_card.match(url.path)
+        if match:
+            rec = index.get(int(match.group(1)))
+            if not rec:
+                self.send_error(404, 'Contact not found')
+                return
+            try:
+                vcard = self.store.vcard(rec)
+            except Exception as e:
+                self.send_error(500, str(e))
+                return
+            self.respond(vcard.encode('utf-8'), 'text/vcard')
+        elif url.path == '/contacts.vcf':
+            self.streamAll(index)
+        elif url.path == '/search':
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            result = index.search(query.get('name', ''),
+                                  query.get('email', ''),
+                                  query.get('phone', ''),
+                                  query.get('prefix', '0') not in ('', '0'))
+            self.respondJSON([summary(x) for x in result])
+        elif url.path == '/status':
+            cache = self.store.cache
+            self.respondJSON({'contacts': len(index), 'cached': len(cache),
+                              'hits': cache.hits, 'misses': cache.misses})
+        else:
+            self.send_error(404)
+
+    def respond(self, body: bytes, contentType: str) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', contentType + '; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def respondJSON(self, data: Any) -> None:
+        self.respond(json.dumps(data).encode('utf-8'), 'application/json')
+
+    def streamAll(self, index: ContactIndex) -> None:
+        ''' Without Content-Length, connection is closed afterwards. '''
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/vcard; charset=utf-8')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        fp = TextIOWrapper(cast(BinaryIO, self.wfile), encoding='utf-8',
+                           newline='', write_through=False)
+        try:
+            for rec in list(index.byId.values()):
+                vcard = self.store.cache.get(rec)
+                try:
+                    if vcard is None:  # do not fill cache with full dump
+                        rec.writeVCard(fp)
+                    else:
+                        fp.write(vcard)
+                except Exception as e:
+                    print(f'Error processing contact {rec.id}: {e}',
+                          file=sys.stderr)
+            fp.flush()
+        finally:
+            fp.detach()  # keep wfile open, closed by server
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if not self.server.quiet:  # type: ignore[attr-defined]
+            super().log_message(format, *args)
+
+
+class Server(HTTPServer):
+    '''
+    Handles requests in a fixed number of threads. Each thread keeps its
+    own connection for image data, so the number of open database
+    connections is bounded as well.
+    '''
+    quiet = False
+
+    def __init__(
+        self, address: Tuple[str, int], handler: Any, threads: int = 8
+    ) -> None:
+        super().__init__(address, handler)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request: Any, client_address: Any) -> None:
+        ''' Same as `ThreadingMixIn.process_request_thread()`. '''
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+def serve(
+    db_path: str, host: str = '127.0.0.1', port: int = 8000,
+    cacheSize: int = 1024, interval: float = 2.0, quiet: bool = False,
+    country: str = '', threads: int = 8,
+) -> None:
+    ''' Serve forever. Reloads contacts on database change. '''
+    store = ContactStore(db_path, cacheSize, country)
+    store.watch(interval)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    handler = type('Handler', (Handler,), {'store': store})
+    with Server((host, port), handler, threads) as httpd:
+        httpd.quiet = quiet
+        print(f'{len(store.index)} contacts. Serving on'
+              f' http://{host}:{httpd.server_address[1]}/', file=sys.stderr)
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def main() -> None:
+    cli = ArgumentParser(description=__doc__)
+    cli.add_argument('-i', '--input', type=str, default=DB_FILE,
+                     metavar='AddressBook.abcddb',
+                     help='Specify another abcddb file.')
+    cli.add_argument('--host', type=str, default='127.0.0.1',
+                     help='Bind address. Default: 127.0.0.1 (local only)')
+    cli.add_argument('-p', '--port', type=int, default=8000,
+                     help='Default: 8000')
+    cli.add_argument('--cache-size', type=int, default=1024, metavar='N',
+                     help='Number of rendered vcards kept in memory.'
+                     ' Default: 1024')
+    cli.add_argument('--interval', type=float, default=2.0,
+                     metavar='SECONDS',
+                     help='Check for database changes. Default: 2')
+    cli.add_argument('--country', type=str, default='', metavar='CODE',
+                     help='Calling code for national phone numbers,'
+                     ' e.g., 49 for Germany.')
+    cli.add_argument('--threads', type=int, default=8, metavar='N',
+                     help='Number of requests handled in parallel.'
+                     ' Default: 8')
+    cli.add_argument('-q', '--quiet', action='store_true',
+                     help='Do not log requests.')
+    args = cli.parse_args()
+
+    if not os.path.isfile(args.input):
+        print('AddressBook "{}" does not exist.'.format(args.input),
+              file=sys.stderr)
+        exit(1)
+    serve(args.input, args.host, args.port, args.cache_size, args.interval,
+          args.quiet, args.country, args.threads)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+'''
+Timing and row count instrumentation for export phases.
+'''
+import sys
+from time import perf_counter
+from contextlib import contextmanager
+from typing import (
+    Any, ContextManager, Dict, Iterable, Iterator, List, Optional, TypeVar)
+
+T = TypeVar('T')
+
+
+def peakRSS() -> int:
+    ''' Peak resident memory of current process in bytes (0 if unknown). '''
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class Stats:
+    '''
+    Accumulates time and item count per phase.
+    Hook API: subclass and override `add()` to receive every measurement.
+    '''
+
+    def __init__(self) -> None:
+        self.phases = {}  # type: Dict[str, List[float]]  # [seconds, count]
+        self._start = perf_counter()
+
+    def add(self, phase: str, seconds: float, count: int = 1) -> None:
+        entry = self.phases.setdefault(phase, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += count
+
+    @contextmanager
+    def measure(self, phase: str, count: int = 1) -> Iterator[None]:
+        t0 = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, perf_counter() - t0, count)
+
+    def wrap(self, phase: str, iterable: Iterable[T]) -> Iterator[T]:
+        ''' Measure time spent in `next()` and count items. '''
+        it = iter(iterable)
+        while True:
+            t0 = perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.add(phase, perf_counter() - t0, 0)
+                return
+            self.add(phase, perf_counter() - t0)
+            yield item
+
+    def asDict(self) -> Dict[str, Any]:
+        return {
+            'total': perf_counter() - self._start,
+            'peak_rss': peakRSS(),
+            'phases': {k: {'seconds': v[0], 'count': v[1]}
+                       for k, v in self.phases.items()},
+        }
+
+    def summary(self) -> str:
+        data = self.asDict()
+        lines = ['{:<24} {:>9} {:>9}'.format('phase', 'time [s]', 'count')]
+        for phase, x in data['phases'].items():
+            lines.append('{:<24} {:>9.3f} {:>9}'.format(
+                phase, x['seconds'], x['count']))
+        lines.append('{:<24} {:>9.3f}'.format('total', data['total']))
+        lines.append('peak memory: {:.1f} MB'.format(data['peak_rss'] / 1e6))
+        return '\n'.join(lines)
+
+
+class _NoStats:
+    ''' Context manager which does nothing. '''
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *args: Any) -> None:
+        return None
+
+
+def measure(
+    stats: Optional[Stats], phase: str, count: int = 1
+) -> ContextManager[None]:
+    ''' Same as `stats.measure()` but accepts `None` (no measurement). '''
+    return stats.measure(phase, count) if stats else _NoStats()
@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+'''
+Restore an AddressBook database (.abcddb) from a Contacts VCards file (.vcf)
+'''
+import os
+import re
+import sys
+import sqlite3
+import calendar
+from time import time
+from base64 import b64decode
+from argparse import ArgumentParser
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+try:
+    from .ABCDDB import (
+        Record, Email, Phone, Address, SocialProfile, Note, URL, Service,
+        unx520)
+except ImportError:  # fallback if not run as module
+    from ABCDDB import (  # type: ignore[import, no-redef]
+        Record, Email, Phone, Address, SocialProfile, Note, URL, Service,
+        unx520)
+
+rx_split = re.compile(r'(?<!\\);')  # split on unescaped semicolon
+rx_date = re.compile(r'^(\d{4})-?(\d{2})-?(\d{2})')
+
+Card = Tuple[Record, Optional[bytes]]  # record & image data
+# (group, NAME, TYPES, value), e.g., ('item1', 'EMAIL', {'HOME'}, 'a@b.c')
+# other parameters are added to TYPES as is, e.g., 'X-SERVICE-TYPE=Skype'
+Property = Tuple[str, str, set, str]
+
+BATCH_SIZE = 500  # cards per executemany() call
+CORE_DATA_EPOCH = 978307200  # 2001-01-01 in unix time
+
+
+# ===============================
+#   VCARD parser
+# ===============================
+
+def unfold(lines: Iterable[str]) -> Iterator[str]:
+    ''' Join folded lines (continuation lines start with a space or tab). '''
+    parts = []  # type: List[str]
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and parts:
+            parts.append(line[1:])
+            continue
+        if parts:
+            yield ''.join(parts)
+        parts = [line]
+    if parts:
+        yield ''.join(parts)
+
+
+def parseProperty(line: str) -> Property:
+    key, _, value = line.partition(':')
+    name, *params = key.split(';')
+    group, _, name = name.rpartition('.')
+    types = set()  # type: Set[str]
+    for param in params:
+        pkey, _, pvalue = param.partition('=')
+        if pkey.upper() == 'TYPE':
+            types.update(x.upper() for x in pvalue.split(','))
+        elif not pvalue:  # vCard 2.1 style, e.g., "TEL;CELL:"
+            types.add(pkey.upper())
+        else:
+            types.add(pkey.upper() + '=' + pvalue)
+    return group, name.upper(), types, value
+
+
+def iterProperties(lines: Iterable[str]) -> Iterator[List[Property]]:
+    ''' Yield all properties of one vcard at a time. '''
+    card = None  # type: Optional[List[Property]]
+    for line in unfold(lines):
+        if not line:
+            continue
+        prop = parseProperty(line)
+        if prop[1] == 'BEGIN':
+            card = []
+        elif prop[1] == 'END':
+            if card is not None:
+                yield card
+            card = None
+        elif card is not None:
+            card.append(prop)
+
+
+def _labelFromTypes(
+    types: set, other: bool = False, mapping: Optional[Dict] = None
+) -> str:
+    if mapping:
+        return mapping.get(frozenset(types - {'PREF'}), '')
+    for typ in ('HOME', 'WORK') + (('OTHER',) if other else ()):
+        if typ in types:
+            return '_$!<{}>!$_'.format(typ.title())
+    return ''
+
+
+PHONE_LABELS = {
+    frozenset(x.split(';type=')[1:]): label
+    for label, x in Phone.LABEL_TYPES.items()
+}  # type: Dict[frozenset, str]
+SERVICE_NAMES = {}  # type: Dict[str, str]  # url scheme -> service
+for _service, _scheme in Service.SCHEMES.items():
+    SERVICE_NAMES.setdefault(_scheme, _service)
+
+
+def makeCard(props: List[Property]) -> Card:
+    '''
+    Map vcard properties onto `Record` and data fields. Record fields keep
+    the escaped (vcard) representation, same as if read from database.
+    '''
+    rec = Record.initEmpty(-1)
+    image = None  # type: Optional[bytes]
+    labels = {x[0]: x[3] for x in props if x[1] == 'X-ABLABEL' and x[0]}
+
+    def label(group: str, types: set, **kwargs: Any) -> Optional[str]:
+        if group in labels:
+            return unx520(labels[group])
+        return _labelFromTypes(types, **kwargs) or None
+
+    for group, name, types, value in props:
+        if name == 'N':
+            parts = rx_split.split(value) + [''] * 5
+            rec.lastname, rec.firstname, rec.middlename, rec.nameprefix, \
+                rec.namesuffix = parts[:5]
+        elif name == 'NICKNAME':
+            rec.nickname = value or None
+        elif name == 'X-MAIDENNAME':
+            rec.maidenname = value or None
+        elif name == 'X-PHONETIC-FIRST-NAME':
+            rec.phonetic_firstname = value or None
+        elif name == 'X-PHONETIC-MIDDLE-NAME':
+            rec.phonetic_middlename = value or None
+        elif name == 'X-PHONETIC-LAST-NAME':
+            rec.phonetic_lastname = value or None
+        elif name == 'X-PHONETIC-ORG':
+            rec.phonetic_org = value or None
+        elif name == 'ORG':
+            org = rx_split.split(value, 1) + ['']
+            rec.organization, rec.department = org[:2]
+        elif name == 'TITLE':
+            rec.jobtitle = value or None
+        elif name == 'EMAIL':
+            rec.email.append(Email(
+                [-1, label(group, types), unx520(value)]))
+        elif name == 'TEL':
+            rec.phone.append(Phone([
+                -1, label(group, types, mapping=PHONE_LABELS), unx520(value)]))
+        elif name == 'ADR':
+            adr = [unx520(x) for x in rx_split.split(value)] + [None] * 7
+            rec.address.append(Address(
+                [-1, label(group, types, other=True)] + adr[2:7]))
+        elif name == 'X-SOCIALPROFILE':
+            # only `type=` values, not other params (e.g. `x-user=name`)
+            service = min((x for x in types if '=' not in x and x != 'PREF'),
+                          default='').lower()
+            rec.socialprofile.append(SocialProfile([-1, service, value]))
+        elif name == 'NOTE':
+            rec.note = Note([-1, unx520(value)]).text or None
+        elif name == 'URL':
+            rec.urls.append(URL([-1, label(group, types), unx520(value)]))
+        elif name == 'BDAY':
+            match = rx_date.match(value)
+            rec.bday = '-'.join(match.groups()) if match else None
+        elif name == 'IMPP':
+            scheme, _, user = value.partition(':')
+            service = next((x.partition('=')[2] for x in types
+                            if x.startswith('X-SERVICE-TYPE=')), '')
+            rec.service.append(Service([
+                -1, (service or SERVICE_NAMES.get(scheme.lower(), scheme))
+                + 'Instant', label(group, types), unx520(user)]))
+        elif name == 'PHOTO':
+            image = _inlineImage(types, value) or image
+        elif name == 'X-ABSHOWAS':
+            rec.iscompany = value.upper() == 'COMPANY'
+    return rec, image
+
+
+def _inlineImage(types: set, value: str) -> Optional[bytes]:
+    ''' Decode base64 PHOTO value. Skip (with warning) if not inline. '''
+    if not value:
+        return None
+    if value.startswith('data:') and ';base64,' in value[:50]:  # vCard 4
+        return b64decode(value.partition(',')[2])
+    if {x.upper() for x in types} & {'ENCODING=B', 'ENCODING=BASE64',
+                                     'BASE64'}:
+        return b64decode(value)
+    print('[WARN] Skipping PHOTO which is not inline image data:',
+          value[:60], file=sys.stderr)
+    return None
+
+
+def iterCards(lines: Iterable[str]) -> Iterator[Card]:
+    ''' Read vcards line by line. Yields `(Record, image)` per contact. '''
+    for props in iterProperties(lines):
+        yield makeCard(props)
+
+
+# ===============================
+#   Database writer
+# ===============================
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS Z_PRIMARYKEY (
+    Z_ENT INTEGER PRIMARY KEY, Z_NAME VARCHAR, Z_SUPER INTEGER,
+    Z_MAX INTEGER);
+CREATE TABLE IF NOT EXISTS ZABCDRECORD (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER,
+    ZDISPLAYFLAGS INTEGER, ZCREATIONDATE TIMESTAMP,
+    ZMODIFICATIONDATE TIMESTAMP, ZBIRTHDAY TIMESTAMP, ZFIRSTNAME VARCHAR,
+    ZLASTNAME VARCHAR, ZMIDDLENAME VARCHAR, ZTITLE VARCHAR, ZSUFFIX VARCHAR,
+    ZNICKNAME VARCHAR, ZMAIDENNAME VARCHAR, ZPHONETICFIRSTNAME VARCHAR,
+    ZPHONETICMIDDLENAME VARCHAR, ZPHONETICLASTNAME VARCHAR,
+    ZPHONETICORGANIZATION VARCHAR, ZORGANIZATION VARCHAR,
+    ZDEPARTMENT VARCHAR, ZJOBTITLE VARCHAR, ZNAME VARCHAR,
+    ZTHUMBNAILIMAGEDATA BLOB);
+CREATE TABLE IF NOT EXISTS ZABCDEMAILADDRESS (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER, ZOWNER INTEGER,
+    ZISPRIMARY INTEGER, ZORDERINGINDEX INTEGER, ZLABEL VARCHAR,
+    ZADDRESS VARCHAR);
+CREATE TABLE IF NOT EXISTS ZABCDPHONENUMBER (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER, ZOWNER INTEGER,
+    ZISPRIMARY INTEGER, ZORDERINGINDEX INTEGER, ZLABEL VARCHAR,
+    ZFULLNUMBER VARCHAR);
+CREATE TABLE IF NOT EXISTS ZABCDPOSTALADDRESS (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER, ZOWNER INTEGER,
+    ZISPRIMARY INTEGER, ZORDERINGINDEX INTEGER, ZLABEL VARCHAR,
+    ZSTREET VARCHAR, ZCITY VARCHAR, ZSTATE VARCHAR, ZZIPCODE VARCHAR,
+    ZCOUNTRYNAME VARCHAR);
+CREATE TABLE IF NOT EXISTS ZABCDSOCIALPROFILE (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER, ZOWNER INTEGER,
+    ZISPRIMARY INTEGER, ZORDERINGINDEX INTEGER, ZSERVICENAME VARCHAR,
+    ZUSERNAME VARCHAR);
+CREATE TABLE IF NOT EXISTS ZABCDNOTE (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER,
+    ZCONTACT INTEGER, ZTEXT VARCHAR);
+CREATE TABLE IF NOT EXISTS ZABCDURLADDRESS (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER, ZOWNER INTEGER,
+    ZISPRIMARY INTEGER, ZORDERINGINDEX INTEGER, ZLABEL VARCHAR,
+    ZURL VARCHAR);
+CREATE TABLE IF NOT EXISTS ZABCDSERVICE (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER,
+    ZSERVICENAME VARCHAR);
+CREATE TABLE IF NOT EXISTS ZABCDMESSAGINGADDRESS (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER, ZOWNER INTEGER,
+    ZISPRIMARY INTEGER, ZORDERINGINDEX INTEGER, ZLABEL VARCHAR,
+    ZADDRESS VARCHAR, ZSERVICE INTEGER);
+CREATE INDEX IF NOT EXISTS ZABCDEMAILADDRESS_ZOWNER_INDEX
+    ON ZABCDEMAILADDRESS (ZOWNER);
+CREATE INDEX IF NOT EXISTS ZABCDPHONENUMBER_ZOWNER_INDEX
+    ON ZABCDPHONENUMBER (ZOWNER);
+CREATE INDEX IF NOT EXISTS ZABCDPOSTALADDRESS_ZOWNER_INDEX
+    ON ZABCDPOSTALADDRESS (ZOWNER);
+CREATE INDEX IF NOT EXISTS ZABCDSOCIALPROFILE_ZOWNER_INDEX
+    ON ZABCDSOCIALPROFILE (ZOWNER);
+CREATE INDEX IF NOT EXISTS ZABCDNOTE_ZCONTACT_INDEX
+    ON ZABCDNOTE (ZCONTACT);
+CREATE INDEX IF NOT EXISTS ZABCDURLADDRESS_ZOWNER_INDEX
+    ON ZABCDURLADDRESS (ZOWNER);
+CREATE INDEX IF NOT EXISTS ZABCDMESSAGINGADDRESS_ZOWNER_INDEX
+    ON ZABCDMESSAGINGADDRESS (ZOWNER);
+'''
+# Core Data entity ids (same as AddressBook-v22)
+ENTITIES = (
+    (19, 'ABCDRecord', 0), (20, 'ABCDGroup', 19), (22, 'ABCDContact', 19),
+    (23, 'ABCDEmailAddress', 0), (24, 'ABCDPhoneNumber', 0),
+    (25, 'ABCDPostalAddress', 0), (26, 'ABCDSocialProfile', 0),
+    (27, 'ABCDNote', 0), (28, 'ABCDURLAddress', 0), (29, 'ABCDService', 0),
+    (30, 'ABCDMessagingAddress', 0),
+)
+
+
+class Table:
+    ''' Pending rows of one table. Columns missing in database are dropped. '''
+
+    def __init__(
+        self, cursor: sqlite3.Cursor, name: str, entity: str,
+        columns: Tuple[str, ...],
+    ) -> None:
+        self.name = name
+        self.entity = entity
+        existing = {x[1] for x in cursor.execute(
+            f'PRAGMA table_info({name});')}
+        self._keep = [i for i, x in enumerate(columns) if x in existing]
+        for x in sorted(set(columns) - existing):
+            print(f'[WARN] Column "{x}" not found in {name}. Ignoring.',
+                  file=sys.stderr)
+        cols = [columns[i] for i in self._keep]
+        self._ent = None  # type: Optional[int]
+        self._opt = 'Z_OPT' in existing
+        if 'Z_ENT' in existing:
+            row = cursor.execute('SELECT Z_ENT FROM Z_PRIMARYKEY'
+                                 ' WHERE Z_NAME = ?;', [entity]).fetchone()
+            self._ent = row[0] if row else None
+            if self._ent is not None:
+                cols.append('Z_ENT')
+        if self._opt:
+            cols.append('Z_OPT')
+        self.sql = 'INSERT INTO {} (Z_PK, {}) VALUES (?{});'.format(
+            name, ', '.join(cols), ', ?' * len(cols))
+        self.nextPk = 1 + (cursor.execute(
+            f'SELECT max(Z_PK) FROM {name};').fetchone()[0] or 0)
+        self.rows = []  # type: List[List[Any]]
+
+    def add(self, values: List[Any]) -> int:
+        ''' Append row and return its new `Z_PK`. '''
+        pk = self.nextPk
+        self.nextPk += 1
+        row = [pk] + [values[i] for i in self._keep]
+        if self._ent is not None:
+            row.append(self._ent)
+        if self._opt:
+            row.append(1)  # Core Data optimistic locking version
+        self.rows.append(row)
+        return pk
+
+    def flush(self, cursor: sqlite3.Cursor) -> None:
+        if self.rows:
+            cursor.executemany(self.sql, self.rows)
+            self.rows = []
+
+
+class ABCDDBWriter:
+    '''
+    Bulk insert contacts into a new or existing `.abcddb` file.
+    All rows are inserted with `executemany()` in a single transaction,
+    which is committed on `close()` (or rolled back on error).
+    New databases get a minimal schema, which can be read by `ABCDDB`
+    but not by Contacts.app (use an empty AddressBook database as template
+    and import into that instead).
+    '''
+
+    def __init__(self, db_path: str) -> None:
+        isNew = not os.path.exists(db_path)
+        self.db = sqlite3.connect(db_path, isolation_level=None)
+        cur = self.db.cursor()
+        if isNew:
+            cur.execute('PRAGMA journal_mode = MEMORY;')
+            cur.execute('PRAGMA synchronous = OFF;')  # fsync only on commit
+            cur.executescript(SCHEMA)
+        cur.execute('BEGIN;')
+        if isNew:
+            cur.executemany('INSERT INTO Z_PRIMARYKEY VALUES (?, ?, ?, 0);',
+                            ENTITIES)
+        self.count = 0
+        self._services = {
+            name: pk for pk, name in cur.execute(
+                'SELECT Z_PK, ZSERVICENAME FROM ZABCDSERVICE;')
+        }  # type: Dict[str, int]
+        self.record = Table(cur, 'ZABCDRECORD', 'ABCDContact', (
+            'ZFIRSTNAME', 'ZLASTNAME', 'ZMIDDLENAME', 'ZTITLE', 'ZSUFFIX',
+            'ZNICKNAME', 'ZMAIDENNAME', 'ZPHONETICFIRSTNAME',
+            'ZPHONETICMIDDLENAME', 'ZPHONETICLASTNAME',
+            'ZPHONETICORGANIZATION', 'ZORGANIZATION', 'ZDEPARTMENT',
+            'ZJOBTITLE', 'ZBIRTHDAY', 'ZDISPLAYFLAGS', 'ZCREATIONDATE',
+            'ZMODIFICATIONDATE', 'ZTHUMBNAILIMAGEDATA'))
+        ordered = ('ZOWNER', 'ZISPRIMARY', 'ZORDERINGINDEX')
+        self.email = Table(cur, 'ZABCDEMAILADDRESS', 'ABCDEmailAddress',
+                           ordered + ('ZLABEL', 'ZADDRESS'))
+        self.phone = Table(cur, 'ZABCDPHONENUMBER', 'ABCDPhoneNumber',
+                           ordered + ('ZLABEL', 'ZFULLNUMBER'))
+        self.address = Table(cur, 'ZABCDPOSTALADDRESS', 'ABCDPostalAddress',
+                             ordered + ('ZLABEL', 'ZSTREET', 'ZCITY',
+                                        'ZSTATE', 'ZZIPCODE', 'ZCOUNTRYNAME'))
+        self.social = Table(cur, 'ZABCDSOCIALPROFILE', 'ABCDSocialProfile',
+                            ordered + ('ZSERVICENAME', 'ZUSERNAME'))
+        self.note = Table(cur, 'ZABCDNOTE', 'ABCDNote', ('ZCONTACT', 'ZTEXT'))
+        self.url = Table(cur, 'ZABCDURLADDRESS', 'ABCDURLAddress',
+                         ordered + ('ZLABEL', 'ZURL'))
+        self.service = Table(cur, 'ZABCDSERVICE', 'ABCDService',
+                             ('ZSERVICENAME',))
+        self.messaging = Table(
+            cur, 'ZABCDMESSAGINGADDRESS', 'ABCDMessagingAddress',
+            ordered + ('ZLABEL', 'ZADDRESS', 'ZSERVICE'))
+        self._tables = (
+            self.record, self.email, self.phone, self.address, self.social,
+            self.note, self.url, self.service, self.messaging)
+
+    @staticmethod
+    def birthday(bday: Optional[str]) -> Optional[float]:
+        ''' `YYYY-MM-DD` to Core Data timestamp (noon GMT, like Apple). '''
+        match = rx_date.match(bday or '')
+        if not match:
+            return None
+        y, m, d = (int(x) for x in match.groups())
+        return calendar.timegm((y, m, d, 12, 0, 0)) - CORE_DATA_EPOCH
+
+    def add(self, rec: Record, image: Optional[bytes] = None) -> int:
+        ''' Queue contact for insert. Returns new `Z_PK` of record. '''
+        now = time() - CORE_DATA_EPOCH
+        pk = self.record.add([unx520(x) for x in (
+            rec.firstname, rec.lastname, rec.middlename, rec.nameprefix,
+            rec.namesuffix, rec.nickname, rec.maidenname,
+            rec.phonetic_firstname, rec.phonetic_middlename,
+            rec.phonetic_lastname, rec.phonetic_org, rec.organization,
+            rec.department, rec.jobtitle)] + [
+            self.birthday(rec.bday), 1 if rec.iscompany else 0, now,
+            rec.modified or now, b'\x01' + image if image else None])
+
+        for i, email in enumerate(rec.email):
+            self.email.add([pk, int(i == 0), i, unx520(email.label),
+                            unx520(email.email)])
+        for i, phone in enumerate(rec.phone):
+            self.phone.add([pk, int(i == 0), i, unx520(phone.label),
+                            unx520(phone.number)])
+        for i, adr in enumerate(rec.address):
+            self.address.add([pk, int(i == 0), i] + [unx520(x) for x in (
+                adr.label, adr.street, adr.city, adr.state, adr.zip,
+                adr.country)])
+        for i, social in enumerate(rec.socialprofile):
+            self.social.add([pk, int(i == 0), i, social.service or None,
+                             social.user or None])
+        if rec.note:
+            self.note.add([pk, unx520(rec.note)])
+        for i, url in enumerate(rec.urls):
+            self.url.add([pk, int(i == 0), i, unx520(url.label),
+                          unx520(url.url)])
+        for i, msg in enumerate(rec.service):
+            name = msg.service + 'Instant'
+            if name not in self._services:
+                self._services[name] = self.service.add([name])
+            self.messaging.add([pk, int(i == 0), i, unx520(msg.label),
+                                unx520(msg.username), self._services[name]])
+
+        self.count += 1
+        if self.count % BATCH_SIZE == 0:
+            self.flush()
+        return pk
+
+    def flush(self) -> None:
+        ''' Insert pending rows (still within the same transaction). '''
+        cur = self.db.cursor()
+        for table in self._tables:
+            table.flush(cur)
+
+    def close(self, commit: bool = True) -> None:
+        if commit:
+            self.flush()
+            # Core Data allocates new ids from Z_MAX
+            self.db.executemany('''UPDATE Z_PRIMARYKEY
+                SET Z_MAX = max(ifnull(Z_MAX, 0), ?) WHERE Z_NAME = ?;''', [
+                (x.nextPk - 1, x.entity) for x in self._tables] + [
+                (self.record.nextPk - 1, 'ABCDRecord')])
+            self.db.execute('COMMIT;')
+        else:
+            self.db.execute('ROLLBACK;')
+        self.db.close()
+
+    def __enter__(self) -> 'ABCDDBWriter':
+        return self
+
+    def __exit__(self, exc_type: Any, *args: Any) -> None:
+        self.close(commit=exc_type is None)
+
+
+def importVCards(lines: Iterable[str], db_path: str) -> int:
+    ''' Insert all vcards into database. Returns number of contacts. '''
+    with ABCDDBWriter(db_path) as writer:
+        for rec, image in iterCards(lines):
+            writer.add(rec, image)
+    return writer.count
+
+
+# ===============================
+#   Main Entry
+# ===============================
+
+def main() -> None:
+    cli = ArgumentParser(description=__doc__)
+    cli.add_argument('input', type=str, metavar='infile.vcf',
+                     help='VCard input file.')
+    cli.add_argument('output', type=str, metavar='AddressBook.abcddb',
+                     help='Output database. A new database has only the'
+                     ' tables needed by abcddb2vcard.')
+    cli.add_argument('-f', '--force', action='store_true',
+                     help='Replace output database if it exists.')
+    cli.add_argument('-a', '--append', action='store_true',
+                     help='Add contacts to an existing database'
+                     ' (e.g., an empty AddressBook as template).')
+    args = cli.parse_args()
+
+    # check input args
+    if not os.path.isfile(args.input):
+        print('VCard file "{}" does not exist.'.format(args.input),
+              file=sys.stderr)
+        exit(1)
+    elif not os.path.isdir(os.path.dirname(args.output) or os.curdir):
+        print('Output parent directory does not exist.', file=sys.stderr)
+        exit(1)
+    elif os.path.exists(args.output) and not args.append:
+        if not args.force:
+            print('Output file already exist. Use -f to force overwrite'
+                  ' or -a to append.', file=sys.stderr)
+            exit(1)
+        for ext in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(args.output + ext):
+                os.remove(args.output + ext)
+
+    with open(args.input, 'r', encoding='utf-8', newline='') as fp:
+        count = importVCards(fp, args.output)
+    print(f'{count} contacts.')
+
+
+if __name__ == '__main__':
+    main()
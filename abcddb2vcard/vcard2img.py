@@ -1,56 +1,170 @@
 #!/usr/bin/env python3
 '''
 Extract all profile pictures from a Contacts VCards file (.vcf)
+or directly from an AddressBook database (.abcddb)
 '''
 import os
 import sys
 from base64 import b64decode
 from argparse import ArgumentParser, FileType
+from concurrent.futures import (
+    FIRST_COMPLETED, Future, ThreadPoolExecutor, wait)
+from functools import partial
+from typing import Callable, Iterable, Iterator, Optional, Set, Tuple
+try:
+    from .ABCDDB import ABCDDB, FilenameTemplate, Image
+except ImportError:  # fallback if not run as module
+    from ABCDDB import (  # type: ignore[import, no-redef]
+        ABCDDB, FilenameTemplate, Image)
 
+Task = Optional[Callable[[str], None]]  # image writer (outdir), per contact
 
-def main() -> None:
-    cli = ArgumentParser(description=__doc__)
-    cli.add_argument('input', type=FileType('r'), metavar='infile.vcf',
-                     help='VCard input file.')
-    cli.add_argument('outdir', type=str, help='Output directory.')
-    args = cli.parse_args()
 
-    # check input args
-    if not os.path.isdir(os.path.dirname(args.outdir) or os.curdir):
-        print('Output parent directory does not exist.', file=sys.stderr)
-        exit(1)
+class Base64Decoder:
+    ''' Incremental base64 decoder for folded (multi-line) values. '''
 
-    os.makedirs(args.outdir, exist_ok=True)
+    def __init__(self) -> None:
+        self.data = bytearray()
+        self._rest = ''
 
-    # perform export
-    c1 = 0
-    c2 = 0
+    def feed(self, text: str) -> None:
+        text = self._rest + text
+        cut = len(text) - len(text) % 4  # decode full 4-char blocks only
+        self._rest = text[cut:]
+        if cut:
+            self.data += b64decode(text[:cut])
+
+    def finish(self) -> bytes:
+        if self._rest:
+            self.data += b64decode(self._rest)
+            self._rest = ''
+        return bytes(self.data)
+
+
+def iterPhotos(lines: Iterable[str]) -> Iterator[Tuple[str, Optional[bytes]]]:
+    '''
+    Read vcards line by line. Yields `(fullname, image)` for each contact.
+    `image` is `None` if the contact has no PHOTO.
+    '''
     name = ''
-    img = ''
+    img = None  # type: Optional[Base64Decoder]
     collect = False
-    for line in args.input.readlines():
+    for line in lines:
         line = line.rstrip()
         if line == 'BEGIN:VCARD':
-            c1 += 1
             name = ''
-            img = ''
+            img = None
             collect = False
         elif line.startswith('FN:'):
             name = line.split(':', 1)[1]
         elif line.startswith('PHOTO;'):
-            img = line.split(':', 1)[1]
+            img = Base64Decoder()
+            img.feed(line.split(':', 1)[1])
             collect = True
         elif collect:
-            if line[0] == ' ':
-                img += line[1:]
+            if line.startswith(' '):
+                img.feed(line[1:])  # type: ignore[union-attr]
             else:
                 collect = False
-        if line == 'END:VCARD' and img:
-            c2 += 1
-            name = name.replace('\\,', ',').replace('\\;', ';').replace(
-                '/', '-')
-            with open(os.path.join(args.outdir, name + '.jpg'), 'wb') as fw:
-                fw.write(b64decode(img))
+        if line == 'END:VCARD':
+            yield name, img.finish() if img else None
+            img = None
+
+
+def unescape(name: str) -> str:
+    return name.replace('\\,', ',').replace('\\;', ';')
+
+
+SLASH = '-'  # replacement for `/` in names, same for .vcf and .abcddb
+
+
+def writeImage(outdir: str, name: str, data: bytes) -> None:
+    name = unescape(name).replace('/', SLASH)
+    with open(os.path.join(outdir, name + '.jpg'), 'wb') as fw:
+        fw.write(data)
+
+
+def copyImage(outdir: str, filename: str, image: Image) -> None:
+    path = os.path.join(outdir, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    image.saveAs(path)
+
+
+def tasksFromVCard(path: str) -> Iterator[Task]:
+    with FileType('r')(path) as fp:
+        for name, img in iterPhotos(fp):
+            yield partial(writeImage, name=name, data=img) if img else None
+
+
+def tasksFromDB(path: str, format: str) -> Iterator[Task]:
+    ''' Copy images without vcard round-trip (no base64 encode & decode). '''
+    template = FilenameTemplate(format, slash=SLASH)
+    for rec in ABCDDB.iterRecords(path):
+        if rec.image:
+            yield partial(copyImage, image=rec.image,
+                          filename=unescape(template.apply(rec)))
+        else:
+            yield None
+
+
+def main() -> None:
+    cli = ArgumentParser(description=__doc__)
+    cli.add_argument('input', type=str, metavar='infile.vcf',
+                     help='VCard input file or AddressBook.abcddb file.')
+    cli.add_argument('outdir', type=str, help='Output directory.')
+    cli.add_argument('--format', type=str, default='%{fullname}.jpg',
+                     help='''Only for .abcddb input. Image filename, can use
+                     any field of type Record. Default: "%%{fullname}.jpg"''')
+    cli.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                     help='Write images in N parallel threads. Default: 1')
+    args = cli.parse_args()
+
+    # check input args
+    if not os.path.isdir(os.path.dirname(args.outdir) or os.curdir):
+        print('Output parent directory does not exist.', file=sys.stderr)
+        exit(1)
+
+    os.makedirs(args.outdir, exist_ok=True)
+
+    # perform export
+    if args.input.endswith('.abcddb'):
+        if not os.path.isfile(args.input):
+            print('AddressBook "{}" does not exist.'.format(args.input),
+                  file=sys.stderr)
+            exit(1)
+        try:
+            FilenameTemplate(args.format)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            exit(1)
+        tasks = tasksFromDB(args.input, args.format)
+    else:
+        tasks = tasksFromVCard(args.input)
+
+    c1 = 0
+    c2 = 0
+    if args.jobs > 1:
+        with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+            pending = set()  # type: Set[Future]
+            for task in tasks:
+                c1 += 1
+                if task:
+                    c2 += 1
+                    # limit number of images held in memory
+                    if len(pending) >= args.jobs * 2:
+                        done, pending = wait(pending,
+                                             return_when=FIRST_COMPLETED)
+                        for x in done:
+                            x.result()  # raise write errors
+                    pending.add(pool.submit(task, args.outdir))
+            for x in pending:
+                x.result()
+    else:
+        for task in tasks:
+            c1 += 1
+            if task:
+                c2 += 1
+                task(args.outdir)
 
     print(c1, 'contacts.', c2, 'images.')
 
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+'''
+Change detection for long-running export (`--watch`).
+'''
+import os
+import sqlite3
+from time import sleep
+from typing import Any, Iterator, Optional, Tuple
+try:
+    from .ABCDDB import ABCDDB, connect
+except ImportError:  # fallback if not run as module
+    from ABCDDB import ABCDDB, connect  # type: ignore[import, no-redef]
+
+Signature = Tuple[Any, ...]
+
+
+def _stat(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class Watcher:
+    '''
+    Detect changes of an AddressBook database by polling.
+    Keeps a read-only connection open and compares `PRAGMA data_version`
+    (changes on every commit of another connection, e.g., Contacts.app),
+    as well as inode, size and mtime of the database, the `-wal` file and
+    the external image directory (files added or removed).
+    The connection can be reused for export (see `ABCDDB.iterRecords()`).
+    '''
+
+    def __init__(self, db_path: str) -> None:
+        self.dbPath = db_path
+        self.imageDir = ABCDDB.imageDir(db_path)
+        self._inode = (_stat(db_path) or (None,))[0]  # type: Optional[int]
+        self.db = connect(db_path)  # type: sqlite3.Connection
+        self._last = self.signature()
+
+    def signature(self) -> Signature:
+        dbFile = _stat(self.dbPath)
+        if dbFile and self._inode != dbFile[0]:  # replaced, e.g., restore
+            self.db.close()
+            self.db = connect(self.dbPath)
+        self._inode = dbFile[0] if dbFile else None
+        version = self.db.execute('PRAGMA data_version;').fetchone()[0]
+        return (version, dbFile, _stat(self.dbPath + '-wal'),
+                _stat(self.imageDir))
+
+    def changes(
+        self, interval: float = 2.0, debounce: float = 1.0
+    ) -> Iterator[None]:
+        '''
+        Poll every `interval` seconds (forever). Yields once per change,
+        after no further change happened for `debounce` seconds
+        (Contacts.app writes multiple transactions per edit).
+        '''
+        while True:
+            sleep(interval)
+            current = self.signature()
+            if current == self._last:
+                continue
+            while True:
+                sleep(debounce)
+                latest = self.signature()
+                if latest == current:
+                    break
+                current = latest
+            self._last = current
+            yield
+
+    def close(self) -> None:
+        self.db.close()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+'''
+Output writers: background file writer and archive writer for multi-file
+export, compressed output streams for single-file export.
+'''
+import io
+import os
+import bz2
+import gzip
+import lzma
+import time
+import tarfile
+import zipfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Optional, Set, TextIO, Union
+
+
+class FileWriter:
+    '''
+    Write text files in background threads, so that rendering does not wait
+    for the file system. Parent directories are created once per directory.
+    Each file is written to a temporary file first and then renamed (atomic).
+    With `threads = 0` all files are written synchronously.
+    '''
+
+    def __init__(self, threads: int = 4, bufferSize: int = 2 ** 16) -> None:
+        self.bufferSize = bufferSize
+        self._dirs = set()  # type: Set[Path]
+        self._pool = None  # type: Optional[ThreadPoolExecutor]
+        if threads > 0:
+            self._pool = ThreadPoolExecutor(max_workers=threads)
+        self._limit = max(1, threads) * 8  # max pending files in memory
+        self._pending = deque()  # type: Deque[Future]
+        self._inflight = {}  # type: Dict[Path, Future]
+        self._lock = threading.Lock()  # `_inflight` is updated by callbacks
+
+    def makedirs(self, path: Path) -> None:
+        if path not in self._dirs:
+            os.makedirs(path, exist_ok=True)
+            self._dirs.add(path)
+
+    def _write(self, path: Path, text: str, append: bool = False) -> None:
+        if append:  # not atomic, but the file exists already
+            with open(path, 'a', buffering=self.bufferSize) as fp:
+                fp.write(text)
+            return
+        tmp = path.with_name(f'.{path.name}.tmp')
+        with open(tmp, 'w', buffering=self.bufferSize) as fp:
+            fp.write(text)
+        os.replace(tmp, path)
+
+    def write(self, path: Path, text: str, append: bool = False) -> None:
+        ''' Raises errors of previous (background) writes. '''
+        self.makedirs(path.parent)
+        if not self._pool:
+            self._write(path, text, append)
+            return
+        # same file written twice: keep order, last write wins
+        with self._lock:
+            previous = self._inflight.get(path)
+        if previous:
+            previous.result()
+        while len(self._pending) >= self._limit:
+            self._pending.popleft().result()
+        future = self._pool.submit(self._write, path, text, append)
+        with self._lock:
+            self._inflight[path] = future
+        future.add_done_callback(lambda x: self._done(path, x))
+        self._pending.append(future)
+
+    def _done(self, path: Path, future: Future) -> None:
+        ''' Remove from `_inflight` unless a newer write is scheduled. '''
+        with self._lock:
+            if self._inflight.get(path) is future:
+                del self._inflight[path]
+
+    def close(self) -> None:
+        ''' Wait for all pending writes. Raises first error. '''
+        if not self._pool:
+            return
+        try:
+            while self._pending:
+                self._pending.popleft().result()
+        finally:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self) -> 'FileWriter':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+# ===============================
+#   Archives & compression
+# ===============================
+
+ARCHIVES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+
+def isArchive(path: str) -> bool:
+    return path.lower().endswith(ARCHIVES)
+
+
+class ArchiveWriter:
+    '''
+    Same interface as `FileWriter` but writes all files into a single
+    `.zip` or `.tar[.gz|.bz2|.xz]` archive. Member names are relative to
+    the archive path, e.g. `out.zip/a/b.vcf` is stored as `a/b.vcf`.
+    The archive is written as a stream (no temporary files) and is only
+    created once the first file is written.
+    '''
+
+    def __init__(self, path: str) -> None:
+        self.root = Path(path)
+        self._zip = None  # type: Optional[zipfile.ZipFile]
+        self._tar = None  # type: Optional[tarfile.TarFile]
+
+    def _open(self) -> None:
+        path = str(self.root)
+        lower = path.lower()
+        if lower.endswith('.zip'):
+            self._zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+        elif lower.endswith(('.tar.gz', '.tgz')):
+            self._tar = tarfile.open(path, 'w|gz')
+        elif lower.endswith('.tar.bz2'):
+            self._tar = tarfile.open(path, 'w|bz2')
+        elif lower.endswith('.tar.xz'):
+            self._tar = tarfile.open(path, 'w|xz')
+        else:
+            self._tar = tarfile.open(path, 'w|')
+
+    def makedirs(self, path: Path) -> None:
+        pass  # directories are implicit
+
+    def write(self, path: Path, text: str, append: bool = False) -> None:
+        if append:
+            raise ValueError('Cannot append to archive member.')
+        if not self._zip and not self._tar:
+            self._open()
+        name = path.relative_to(self.root).as_posix()
+        data = text.encode('utf-8')
+        if self._zip:
+            with self._zip.open(name, 'w') as fp:
+                fp.write(data)
+        elif self._tar:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            info.mode = 0o644
+            self._tar.addfile(info, io.BytesIO(data))
+
+    def close(self) -> None:
+        if self._zip:
+            self._zip.close()
+            self._zip = None
+        if self._tar:
+            self._tar.close()
+            self._tar = None
+
+    def __enter__(self) -> 'ArchiveWriter':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+def _zstdModule() -> Any:
+    try:
+        from compression import zstd  # type: ignore  # Python 3.14+
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard  # type: ignore
+        return zstandard
+    except ImportError:
+        raise ImportError('.zst output requires Python 3.14+ or'
+                          ' "pip install zstandard"')
+
+
+def _zstdOpen(path: str, mode: str) -> TextIO:
+    return _zstdModule().open(path, mode)  # type: ignore[no-any-return]
+
+
+COMPRESSORS = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+    '.xz': lzma.open,
+    '.zst': _zstdOpen,
+}  # type: Dict[str, Callable[[str, str], Any]]
+
+
+def compressor(path: str) -> Optional[Callable[[str, str], Any]]:
+    '''
+    Get `open()` function for file extension, `None` if not compressed.
+    Raises `ImportError` if the compression module is not available.
+    '''
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.zst':
+        _zstdModule()
+    return COMPRESSORS.get(ext)
+
+
+def openText(path: str, bufferSize: int = -1) -> TextIO:
+    ''' Open text file for writing. Compressed if extension is known. '''
+    opener = compressor(path)
+    if opener:
+        return opener(path, 'wt')  # type: ignore[no-any-return]
+    return open(path, 'w', buffering=bufferSize)
+
+
+Writer = Union[FileWriter, ArchiveWriter]
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+'''
+Benchmark all processing phases on a synthetic AddressBook database.
+Reports time, throughput and peak memory. Use --json to store results and
+--compare to check against results of a previous run (e.g., other commit).
+'''
+import os
+import sys
+import json
+import platform
+import sqlite3
+import subprocess
+from time import perf_counter
+from tempfile import TemporaryDirectory
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from abcddb2vcard.ABCDDB import ABCDDB  # noqa: E402
+from abcddb2vcard.stats import peakRSS  # noqa: E402
+from abcddb2vcard.vcard2img import iterPhotos, tasksFromDB  # noqa: E402
+from benchmark.synthetic import generate  # noqa: E402
+
+
+class _NullWriter:
+    ''' Text sink which only counts bytes. '''
+
+    def __init__(self) -> None:
+        self.size = 0
+
+    def write(self, text: str) -> int:
+        self.size += len(text)
+        return len(text)
+
+
+# ===============================
+#   Phases
+# ===============================
+# Each phase returns (number of processed items, number of processed bytes)
+
+def _load(db: str, loader: str) -> Tuple[int, int]:
+    return sum(1 for _ in ABCDDB.iterRecords(db, loader)), 0
+
+
+def phaseLoadMerge(db: str, workdir: str) -> Tuple[int, int]:
+    return _load(db, 'merge')
+
+
+def phaseLoadJSON(db: str, workdir: str) -> Tuple[int, int]:
+    return _load(db, 'json')
+
+
+def phaseRender(db: str, workdir: str) -> Tuple[int, int]:
+    sink = _NullWriter()
+    count = 0
+    for rec in ABCDDB.iterRecords(db):
+        rec.writeVCard(sink)  # type: ignore[arg-type]
+        count += 1
+    return count, sink.size
+
+
+def phaseExport(db: str, workdir: str) -> Tuple[int, int]:
+    path = os.path.join(workdir, 'export.vcf')
+    count = 0
+    with open(path, 'w') as fp:
+        for rec in ABCDDB.iterRecords(db):
+            rec.writeVCard(fp)
+            count += 1
+    return count, os.path.getsize(path)
+
+
+def phaseExportSplit(db: str, workdir: str) -> Tuple[int, int]:
+    outDir = os.path.join(workdir, 'split')
+    os.makedirs(outDir, exist_ok=True)
+    count = 0
+    size = 0
+    for rec in ABCDDB.iterRecords(db):
+        path = os.path.join(outDir, rec.formatFilename('%{id}.vcf'))
+        with open(path, 'w') as fp:
+            rec.writeVCard(fp)
+        size += os.path.getsize(path)
+        count += 1
+    return count, size
+
+
+def phaseVcard2img(db: str, workdir: str) -> Tuple[int, int]:
+    path = os.path.join(workdir, 'export.vcf')  # see prepare()
+    count = 0
+    with open(path, 'r') as fp:
+        for _, img in iterPhotos(fp):
+            count += 1
+    return count, os.path.getsize(path)
+
+
+def phaseImgDirect(db: str, workdir: str) -> Tuple[int, int]:
+    outDir = os.path.join(workdir, 'img')
+    os.makedirs(outDir, exist_ok=True)
+    count = 0
+    for task in tasksFromDB(db, '%{id}.jpg'):
+        count += 1
+        if task:
+            task(outDir)
+    return count, sum(x.stat().st_size for x in os.scandir(outDir))
+
+
+PHASES = {
+    'load-merge': phaseLoadMerge,
+    'load-json': phaseLoadJSON,
+    'render': phaseRender,
+    'export': phaseExport,
+    'export-split': phaseExportSplit,
+    'vcard2img': phaseVcard2img,
+    'img-direct': phaseImgDirect,
+}  # type: Dict[str, Callable[[str, str], Tuple[int, int]]]
+
+
+# ===============================
+#   Measurement
+# ===============================
+
+def _measure(phase: str, db: str, workdir: str) -> Dict[str, Any]:
+    ''' Runs in a fresh process, so that peak memory is per phase. '''
+    devnull = open(os.devnull, 'w')
+    sys.stderr = devnull  # ignore export warnings
+    t0 = perf_counter()
+    count, size = PHASES[phase](db, workdir)
+    seconds = perf_counter() - t0
+    devnull.close()
+    return {'seconds': seconds, 'items': count, 'bytes': size,
+            'peak_rss': peakRSS()}
+
+
+def prepare(phase: str, db: str, workdir: str) -> None:
+    ''' Create phase input (excluded from measurement). '''
+    if phase == 'vcard2img':
+        if not os.path.isfile(os.path.join(workdir, 'export.vcf')):
+            phaseExport(db, workdir)
+
+
+def run(phase: str, db: str, workdir: str, repeat: int) -> Dict[str, Any]:
+    prepare(phase, db, workdir)
+    runs = []
+    for _ in range(max(1, repeat)):
+        with ProcessPoolExecutor(
+                max_workers=1, mp_context=get_context('spawn')) as pool:
+            runs.append(pool.submit(_measure, phase, db, workdir).result())
+    best = min(runs, key=lambda x: x['seconds'])
+    best['peak_rss'] = max(x['peak_rss'] for x in runs)
+    sec = best['seconds'] or 1e-9
+    best['items_per_s'] = best['items'] / sec
+    best['mb_per_s'] = best['bytes'] / sec / 1e6
+    return best
+
+
+def gitCommit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        ).stdout.decode('utf-8').strip()
+    except Exception:
+        return ''
+
+
+def printResults(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> None:
+    print('{:<13} {:>9} {:>11} {:>9} {:>10}{}'.format(
+        'phase', 'time [s]', 'items/s', 'MB/s', 'peak [MB]',
+        '   vs. baseline' if baseline else ''))
+    for phase, res in results.items():
+        cmp = ''
+        if baseline and phase in baseline:
+            old = baseline[phase]
+            cmp = '   time {:+6.1%}, mem {:+6.1%}'.format(
+                res['seconds'] / (old['seconds'] or 1e-9) - 1,
+                res['peak_rss'] / (old['peak_rss'] or 1) - 1)
+        print('{:<13} {:>9.3f} {:>11.0f} {:>9.1f} {:>10.1f}{}'.format(
+            phase, res['seconds'], res['items_per_s'], res['mb_per_s'],
+            res['peak_rss'] / 1e6, cmp))
+
+
+def main() -> None:
+    cli = ArgumentParser(description=__doc__)
+    cli.add_argument('-n', '--contacts', type=int, default=5000,
+                     help='Number of synthetic contacts. Default: 5000')
+    cli.add_argument('--fields', type=int, default=2,
+                     help='Average number of data fields per type.')
+    cli.add_argument('--images', type=float, default=0.3, metavar='RATIO',
+                     help='Share of contacts with an image. Default: 0.3')
+    cli.add_argument('--image-size', type=int, default=20000,
+                     help='Image size in bytes. Default: 20000')
+    cli.add_argument('-r', '--repeat', type=int, default=3,
+                     help='Runs per phase, best run is reported. Default: 3')
+    cli.add_argument('-p', '--phase', choices=PHASES.keys(), action='append',
+                     help='Only run this phase (can be repeated).')
+    cli.add_argument('-i', '--input', type=str, metavar='AddressBook.abcddb',
+                     help='Use existing database instead of synthetic one.')
+    cli.add_argument('--json', type=str, metavar='FILE',
+                     help='Save results as JSON.')
+    cli.add_argument('--compare', type=str, metavar='FILE',
+                     help='Compare with results of a previous --json run.')
+    args = cli.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)['results']
+
+    with TemporaryDirectory(prefix='abcddb-bench-') as workdir:
+        db = args.input
+        params = {}  # type: Dict[str, Any]
+        if not db:
+            db = os.path.join(workdir, 'AddressBook-v22.abcddb')
+            params = {'contacts': args.contacts, 'fields': args.fields,
+                      'images': args.images, 'image_size': args.image_size}
+            t0 = perf_counter()
+            generate(db, args.contacts, fields=args.fields,
+                     imageRatio=args.images, imageSize=args.image_size)
+            print('generated {} contacts in {:.1f}s ({:.1f} MB)'.format(
+                args.contacts, perf_counter() - t0,
+                os.path.getsize(db) / 1e6))
+
+        results = {}  # type: Dict[str, Dict[str, Any]]
+        phases = args.phase or list(PHASES.keys())  # type: List[str]
+        for phase in phases:
+            results[phase] = run(phase, db, workdir, args.repeat)
+
+    printResults(results, baseline)
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump({
+                'commit': gitCommit(),
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'platform': platform.platform(),
+                'params': params,
+                'results': results,
+            }, fp, indent=2)
+
+
+if __name__ == '__main__':
+    main()
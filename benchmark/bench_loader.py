@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+'''
+Compare the query strategies of `ABCDDB.iterRecords` (see LOADERS).
+'''
+import os
+import sys
+from time import perf_counter
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from abcddb2vcard.ABCDDB import ABCDDB, LOADERS  # noqa: E402
+
+
+def main() -> None:
+    cli = ArgumentParser(description=__doc__)
+    cli.add_argument('input', type=str, metavar='AddressBook.abcddb',
+                     help='AddressBook database file.')
+    cli.add_argument('-n', '--repeat', type=int, default=5,
+                     help='Number of runs per loader. Best run is reported.')
+    cli.add_argument('--render', action='store_true',
+                     help='Include makeVCard() in measurement.')
+    args = cli.parse_args()
+
+    print('{:<8} {:>8} {:>10} {:>12}'.format(
+        'loader', 'records', 'best [s]', 'records/s'))
+    for loader in LOADERS:
+        best = float('inf')
+        count = 0
+        for _ in range(args.repeat):
+            t0 = perf_counter()
+            count = 0
+            for rec in ABCDDB.iterRecords(args.input, loader):
+                if args.render:
+                    rec.makeVCard()
+                count += 1
+            best = min(best, perf_counter() - t0)
+        print('{:<8} {:>8} {:>10.4f} {:>12.0f}'.format(
+            loader, count, best, count / best if best else 0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+'''
+Generate a synthetic AddressBook database (.abcddb) for benchmarks.
+Mirrors the Core Data tables and columns which are read by `ABCDDB`.
+'''
+import os
+import random
+import sqlite3
+from argparse import ArgumentParser
+from typing import List, Optional
+
+SCHEMA = '''
+CREATE TABLE Z_PRIMARYKEY (
+    Z_ENT INTEGER PRIMARY KEY, Z_NAME VARCHAR, Z_SUPER INTEGER,
+    Z_MAX INTEGER);
+CREATE TABLE ZABCDRECORD (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER,
+    ZDISPLAYFLAGS INTEGER, ZBIRTHDAY TIMESTAMP, ZCREATIONDATE TIMESTAMP,
+    ZMODIFICATIONDATE TIMESTAMP, ZDEPARTMENT VARCHAR, ZFIRSTNAME VARCHAR,
+    ZJOBTITLE VARCHAR, ZLASTNAME VARCHAR, ZMAIDENNAME VARCHAR,
+    ZMIDDLENAME VARCHAR, ZNICKNAME VARCHAR, ZORGANIZATION VARCHAR,
+    ZPHONETICFIRSTNAME VARCHAR, ZPHONETICLASTNAME VARCHAR,
+    ZPHONETICMIDDLENAME VARCHAR, ZPHONETICORGANIZATION VARCHAR,
+    ZSUFFIX VARCHAR, ZTITLE VARCHAR, ZNAME VARCHAR,
+    ZTHUMBNAILIMAGEDATA BLOB);
+CREATE TABLE ZABCDEMAILADDRESS (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER,
+    ZISPRIMARY INTEGER, ZORDERINGINDEX INTEGER, ZOWNER INTEGER,
+    ZADDRESS VARCHAR, ZLABEL VARCHAR);
+CREATE TABLE ZABCDPHONENUMBER (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER,
+    ZISPRIMARY INTEGER, ZORDERINGINDEX INTEGER, ZOWNER INTEGER,
+    ZFULLNUMBER VARCHAR, ZLABEL VARCHAR);
+CREATE TABLE ZABCDPOSTALADDRESS (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER,
+    ZISPRIMARY INTEGER, ZORDERINGINDEX INTEGER, ZOWNER INTEGER,
+    ZCITY VARCHAR, ZCOUNTRYNAME VARCHAR, ZLABEL VARCHAR, ZSTATE VARCHAR,
+    ZSTREET VARCHAR, ZZIPCODE VARCHAR);
+CREATE TABLE ZABCDSOCIALPROFILE (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER,
+    ZOWNER INTEGER, ZSERVICENAME VARCHAR, ZUSERNAME VARCHAR);
+CREATE TABLE ZABCDNOTE (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER,
+    ZCONTACT INTEGER, ZTEXT VARCHAR);
+CREATE TABLE ZABCDURLADDRESS (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER,
+    ZISPRIMARY INTEGER, ZORDERINGINDEX INTEGER, ZOWNER INTEGER,
+    ZLABEL VARCHAR, ZURL VARCHAR);
+CREATE TABLE ZABCDSERVICE (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER,
+    ZSERVICENAME VARCHAR);
+CREATE TABLE ZABCDMESSAGINGADDRESS (
+    Z_PK INTEGER PRIMARY KEY, Z_ENT INTEGER, Z_OPT INTEGER,
+    ZISPRIMARY INTEGER, ZORDERINGINDEX INTEGER, ZOWNER INTEGER,
+    ZSERVICE INTEGER, ZADDRESS VARCHAR, ZLABEL VARCHAR);
+CREATE INDEX ZABCDRECORD_Z_ENT_INDEX ON ZABCDRECORD (Z_ENT);
+CREATE INDEX ZABCDEMAILADDRESS_ZOWNER_INDEX ON ZABCDEMAILADDRESS (ZOWNER);
+CREATE INDEX ZABCDPHONENUMBER_ZOWNER_INDEX ON ZABCDPHONENUMBER (ZOWNER);
+CREATE INDEX ZABCDPOSTALADDRESS_ZOWNER_INDEX ON ZABCDPOSTALADDRESS (ZOWNER);
+CREATE INDEX ZABCDSOCIALPROFILE_ZOWNER_INDEX ON ZABCDSOCIALPROFILE (ZOWNER);
+CREATE INDEX ZABCDNOTE_ZCONTACT_INDEX ON ZABCDNOTE (ZCONTACT);
+CREATE INDEX ZABCDURLADDRESS_ZOWNER_INDEX ON ZABCDURLADDRESS (ZOWNER);
+CREATE INDEX ZABCDMESSAGINGADDRESS_ZOWNER_INDEX
+    ON ZABCDMESSAGINGADDRESS (ZOWNER);
+'''
+
+ENTITIES = [(19, 'ABCDRecord', 0), (20, 'ABCDGroup', 19),
+            (21, 'ABCDSubscribedInfo', 19), (22, 'ABCDContact', 19)]
+SERVICES = ['JabberInstant', 'MSNInstant', 'YahooInstant', 'ICQInstant',
+            'GoogleTalkInstant', 'FacebookInstant', 'SkypeInstant',
+            'QQInstant', 'GaduGaduInstant']
+LABELS = ['_$!<Home>!$_', '_$!<Work>!$_', '_$!<Other>!$_',
+          '_$!<Mobile>!$_', 'iPhone', '_$!<Main>!$_', '_$!<HomeFAX>!$_',
+          '_$!<WorkFAX>!$_', '_$!<Pager>!$_', 'custom, la;bel', None]
+BDAY_NO_YEAR = -12513830400.0  # 1604-06-15, year omitted
+NAMES = ['Anna', 'Bob', 'Chloé', 'Dmitri', 'Eve', 'François', 'Grace',
+         'Hiroshi', 'Inès', 'Jürgen', 'Kim', 'Lena', 'Mateo', 'Noor']
+
+
+def fakeJpeg(rnd: random.Random, size: int) -> bytes:
+    ''' Random bytes with a JFIF header (enough for the exporter). '''
+    header = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01'
+    payload = rnd.getrandbits(8 * max(0, size - len(header) - 2))
+    return header + payload.to_bytes(max(0, size - len(header) - 2),
+                                     'little') + b'\xff\xd9'
+
+
+def generate(
+    path: str,
+    contacts: int = 1000,
+    *,
+    fields: int = 2,
+    imageRatio: float = 0.3,
+    externalRatio: float = 0.5,
+    imageSize: int = 20000,
+    seed: int = 42,
+) -> None:
+    '''
+    Create new database at `path` (existing file is replaced).
+    `fields`: average number of emails / phones / ... per contact.
+    `imageRatio`: share of contacts with image. `externalRatio`: share of
+    images stored in hidden `_EXTERNAL_DATA` folder instead of the db.
+    '''
+    rnd = random.Random(seed)
+    for ext in ('', '-wal', '-shm'):
+        if os.path.exists(path + ext):
+            os.remove(path + ext)
+    extDir = os.path.join(
+        os.path.dirname(os.path.abspath(path)),
+        '.{}_SUPPORT'.format(os.path.splitext(os.path.basename(path))[0]),
+        '_EXTERNAL_DATA')
+    os.makedirs(extDir, exist_ok=True)
+
+    def some(prob: float, value: str) -> Optional[str]:
+        return value if rnd.random() < prob else None
+
+    def count() -> int:
+        return rnd.randint(0, 2 * fields)
+
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    db.executemany('INSERT INTO Z_PRIMARYKEY VALUES (?, ?, ?, 0)', ENTITIES)
+    db.executemany('INSERT INTO ZABCDSERVICE (Z_PK, ZSERVICENAME) '
+                   'VALUES (?, ?)', enumerate(SERVICES, 1))
+    db.execute('INSERT INTO ZABCDRECORD (Z_PK, Z_ENT, ZNAME) '
+               'VALUES (1, 20, "Group")')
+
+    records = []  # type: List[tuple]
+    attr = {x: [] for x in (
+        'email', 'phone', 'address', 'social', 'note', 'url', 'im',
+    )}  # type: dict
+    for pk in range(2, contacts + 2):
+        first = rnd.choice(NAMES)
+        last = rnd.choice(NAMES) + 's'
+        image = None
+        if rnd.random() < imageRatio:
+            data = fakeJpeg(rnd, imageSize)
+            if rnd.random() < externalRatio:
+                name = 'IMG-{:08d}'.format(pk)
+                with open(os.path.join(extDir, name), 'wb') as fp:
+                    fp.write(data)
+                image = b'\x02' + name.encode('ascii') + b'\x00'
+            else:
+                image = b'\x01' + data
+        records.append((
+            pk, 22, int(rnd.random() < 0.05),
+            rnd.choice([None, 300000000.0, BDAY_NO_YEAR]),
+            600000000.0 + pk * 10, 700000000.0 + pk * 10,
+            some(0.2, 'Sales'), first, some(0.3, 'Engineer'), last,
+            some(0.05, 'Maiden'), some(0.2, 'M.'), some(0.1, 'Nick'),
+            some(0.4, 'Company {}, Inc.'.format(pk % 97)),
+            some(0.05, first.lower()), some(0.05, last.lower()), None, None,
+            some(0.05, 'Jr.'), some(0.05, 'Dr.'), image))
+        for i in range(count()):
+            attr['email'].append((int(i == 0), i, pk, '{}.{}{}@example.com'
+                                  .format(first, last, pk).lower(),
+                                  rnd.choice(LABELS)))
+        for i in range(count()):
+            attr['phone'].append((int(i == 0), i, pk, '+49 (0) 171 {:07d}'
+                                  .format(rnd.randrange(10 ** 7)),
+                                  rnd.choice(LABELS)))
+        for i in range(count() // 2):
+            attr['address'].append((
+                int(i == 0), i, pk, 'City', 'Country', rnd.choice(LABELS),
+                some(0.3, 'State'), '{} Main St.\nApt. {}'.format(pk, i),
+                '{:05d}'.format(pk % 100000)))
+        if rnd.random() < 0.1:
+            attr['social'].append((pk, 'twitter', 'user{}'.format(pk)))
+        if rnd.random() < 0.2:
+            attr['note'].append((pk, 'Note for {},\nline two; end'.format(pk)))
+        for i in range(count() // 2):
+            attr['url'].append((int(i == 0), i, pk, rnd.choice(LABELS),
+                                'https://example.com/{}/{}'.format(pk, i)))
+        if rnd.random() < 0.1:
+            attr['im'].append((1, 0, pk, rnd.randint(1, len(SERVICES)),
+                               'im{}'.format(pk), rnd.choice(LABELS)))
+
+    db.executemany('''INSERT INTO ZABCDRECORD (
+        Z_PK, Z_ENT, ZDISPLAYFLAGS, ZBIRTHDAY, ZCREATIONDATE,
+        ZMODIFICATIONDATE, ZDEPARTMENT, ZFIRSTNAME, ZJOBTITLE, ZLASTNAME,
+        ZMAIDENNAME, ZMIDDLENAME, ZNICKNAME, ZORGANIZATION,
+        ZPHONETICFIRSTNAME, ZPHONETICLASTNAME, ZPHONETICMIDDLENAME,
+        ZPHONETICORGANIZATION, ZSUFFIX, ZTITLE, ZTHUMBNAILIMAGEDATA
+    ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)''', records)
+    db.executemany('''INSERT INTO ZABCDEMAILADDRESS (
+        ZISPRIMARY, ZORDERINGINDEX, ZOWNER, ZADDRESS, ZLABEL
+    ) VALUES (?,?,?,?,?)''', attr['email'])
+    db.executemany('''INSERT INTO ZABCDPHONENUMBER (
+        ZISPRIMARY, ZORDERINGINDEX, ZOWNER, ZFULLNUMBER, ZLABEL
+    ) VALUES (?,?,?,?,?)''', attr['phone'])
+    db.executemany('''INSERT INTO ZABCDPOSTALADDRESS (
+        ZISPRIMARY, ZORDERINGINDEX, ZOWNER, ZCITY, ZCOUNTRYNAME, ZLABEL,
+        ZSTATE, ZSTREET, ZZIPCODE
+    ) VALUES (?,?,?,?,?,?,?,?,?)''', attr['address'])
+    db.executemany('''INSERT INTO ZABCDSOCIALPROFILE (
+        ZOWNER, ZSERVICENAME, ZUSERNAME) VALUES (?,?,?)''', attr['social'])
+    db.executemany('''INSERT INTO ZABCDNOTE (ZCONTACT, ZTEXT)
+        VALUES (?,?)''', attr['note'])
+    db.executemany('''INSERT INTO ZABCDURLADDRESS (
+        ZISPRIMARY, ZORDERINGINDEX, ZOWNER, ZLABEL, ZURL
+    ) VALUES (?,?,?,?,?)''', attr['url'])
+    db.executemany('''INSERT INTO ZABCDMESSAGINGADDRESS (
+        ZISPRIMARY, ZORDERINGINDEX, ZOWNER, ZSERVICE, ZADDRESS, ZLABEL
+    ) VALUES (?,?,?,?,?,?)''', attr['im'])
+    db.commit()
+    db.close()
+    open(path + '-wal', 'a').close()  # avoid warning, not used though
+
+
+def main() -> None:
+    cli = ArgumentParser(description=__doc__)
+    cli.add_argument('output', type=str, metavar='AddressBook.abcddb',
+                     help='Database file to create.')
+    cli.add_argument('-n', '--contacts', type=int, default=1000,
+                     help='Number of contacts. Default: 1000')
+    cli.add_argument('--fields', type=int, default=2,
+                     help='Average number of data fields per type.')
+    cli.add_argument('--images', type=float, default=0.3, metavar='RATIO',
+                     help='Share of contacts with an image. Default: 0.3')
+    cli.add_argument('--external', type=float, default=0.5, metavar='RATIO',
+                     help='Share of images stored in _EXTERNAL_DATA.')
+    cli.add_argument('--image-size', type=int, default=20000,
+                     help='Image size in bytes. Default: 20000')
+    cli.add_argument('--seed', type=int, default=42)
+    args = cli.parse_args()
+    generate(args.output, args.contacts, fields=args.fields,
+             imageRatio=args.images, externalRatio=args.external,
+             imageSize=args.image_size, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
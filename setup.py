@@ -13,10 +13,15 @@ setup(
     url='https://github.com/relikd/abcddb2vcard',
     license='MIT',
     packages=['abcddb2vcard'],
+    extras_require={
+        'zstd': ['zstandard'],
+    },
     entry_points={
         'console_scripts': [
             'abcddb2vcard=abcddb2vcard.abcddb2vcard:main',
             'vcard2img=abcddb2vcard.vcard2img:main',
+            'vcard2abcddb=abcddb2vcard.vcard2abcddb:main',
+            'abcddb2vcard-server=abcddb2vcard.server:main',
         ]
     },
     long_description_content_type="text/markdown",
@@ -0,0 +1,66 @@
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+
+from abcddb2vcard.ABCDDB import ABCDDB, LOADERS
+from abcddb2vcard.vcard2abcddb import importVCards
+
+VCARDS = '''BEGIN:VCARD
+VERSION:3.0
+N:Doe;John;;;
+FN:John Doe
+EMAIL;type=INTERNET:john@example.com
+END:VCARD
+BEGIN:VCARD
+VERSION:3.0
+N:Roe;Jane;;;
+FN:Jane Roe
+TEL;type=CELL:+49 171 1234567
+END:VCARD
+'''
+
+
+class TestOrphans(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'AB.abcddb')
+        importVCards(io.StringIO(VCARDS), self.db_path)
+        db = sqlite3.connect(self.db_path)
+        with db:
+            db.execute('''INSERT INTO ZABCDEMAILADDRESS
+                (ZOWNER, ZISPRIMARY, ZORDERINGINDEX, ZADDRESS)
+                VALUES (NULL, 0, 0, 'null@example.com');''')
+            db.execute('''INSERT INTO ZABCDPHONENUMBER
+                (ZOWNER, ZISPRIMARY, ZORDERINGINDEX, ZFULLNUMBER)
+                VALUES (NULL, 0, 0, '123');''')
+            db.execute('''INSERT INTO ZABCDEMAILADDRESS
+                (ZOWNER, ZISPRIMARY, ZORDERINGINDEX, ZADDRESS)
+                VALUES (99, 0, 0, 'orphan@example.com');''')
+        db.close()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def load(self, loader: str) -> list:
+        with redirect_stderr(io.StringIO()):
+            return [(rec.id, [x.email for x in rec.email],
+                     [x.number for x in rec.phone])
+                    for rec in ABCDDB.iterRecords(self.db_path, loader)]
+
+    def test_null_owner(self) -> None:
+        expected = [
+            (1, ['john@example.com'], []),
+            (2, [], ['+49 171 1234567']),
+            (None, ['null@example.com'], ['123']),
+            (99, ['orphan@example.com'], []),
+        ]
+        for loader in LOADERS:
+            with self.subTest(loader=loader):
+                self.assertEqual(self.load(loader), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
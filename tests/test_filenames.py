@@ -0,0 +1,22 @@
+import unittest
+
+from abcddb2vcard.filenames import FilenamePlan
+
+
+class TestFilenamePlan(unittest.TestCase):
+    def resolveAll(self, names: list) -> list:
+        plan = FilenamePlan('suffix')
+        return [plan.resolve(x)[0] for x in names]
+
+    def test_suffix(self) -> None:
+        self.assertEqual(self.resolveAll(['a.vcf', 'A.vcf', 'a.vcf']),
+                         ['a.vcf', 'A_2.vcf', 'a_3.vcf'])
+
+    def test_empty_name(self) -> None:
+        self.assertEqual(
+            self.resolveAll(['.vcf', '.vcf', 'dir/.vcf', 'dir/.vcf']),
+            ['.vcf', '_2.vcf', 'dir/.vcf', 'dir/_2.vcf'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+
+from abcddb2vcard.index import SearchIndex, normPhone
+from abcddb2vcard.vcard2abcddb import importVCards
+
+VCARDS = '''BEGIN:VCARD
+VERSION:3.0
+N:Doe;John;;;
+FN:John Doe
+EMAIL;type=INTERNET:john@example.com
+END:VCARD
+'''
+
+
+class TestNormPhone(unittest.TestCase):
+    def test_trunk_prefix(self) -> None:
+        expected = '+491719763593'
+        for number in ('+49 (0) 171 9763593', '+49(0)1719763593',
+                       '0049 (0)171 9763593', '+49 171 9763593'):
+            with self.subTest(number=number):
+                self.assertEqual(normPhone(number), expected)
+        self.assertEqual(normPhone('0171 9763593', '49'), expected)
+
+    def test_national(self) -> None:
+        self.assertEqual(normPhone('(0171) 976-3593'), '01719763593')
+        self.assertEqual(normPhone('(0) 171 9763593'), '01719763593')
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'AB.abcddb')
+        importVCards(io.StringIO(VCARDS), self.db_path)
+        db = sqlite3.connect(self.db_path)
+        with db:
+            db.execute('''INSERT INTO ZABCDEMAILADDRESS
+                (ZOWNER, ZISPRIMARY, ZORDERINGINDEX, ZADDRESS)
+                VALUES (NULL, 0, 0, 'john@example.com');''')
+        db.close()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_null_owner(self) -> None:
+        path = os.path.join(self.tmp.name, 'index.json')
+        with redirect_stderr(io.StringIO()):
+            index = SearchIndex.cached(path, self.db_path)
+        self.assertEqual(index.find(email='john@example.com'), [1])
+        loaded = SearchIndex.load(path)
+        self.assertIsNotNone(loaded)
+        self.assertEqual(loaded.names, {1: 'John Doe'})  # type: ignore
+
+
+if __name__ == '__main__':
+    unittest.main()